@@ -1,5 +1,5 @@
 import os
-import requests
+import http_client
 from typing import Optional
 
 
@@ -104,12 +104,7 @@ class AIClient:
                 url = item.get("url") if isinstance(item, dict) else None
                 b64 = item.get("b64_json") if isinstance(item, dict) else None
                 if url:
-                    r = requests.get(url, stream=True, timeout=15)
-                    r.raise_for_status()
-                    with open(out_path, "wb") as f:
-                        for chunk in r.iter_content(1024):
-                            f.write(chunk)
-                    return out_path
+                    return http_client.download_to(url, out_path)
                 if b64:
                     import base64
 
@@ -128,12 +123,7 @@ class AIClient:
                 url = data[0].get("url")
                 if not url:
                     raise RuntimeError("No URL returned for generated image")
-                r = requests.get(url, stream=True)
-                r.raise_for_status()
-                with open(out_path, "wb") as f:
-                    for chunk in r.iter_content(1024):
-                        f.write(chunk)
-                return out_path
+                return http_client.download_to(url, out_path)
             except Exception:
                 raise
 
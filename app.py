@@ -1,52 +1,58 @@
 import tkinter as tk
 from tkinter import scrolledtext, messagebox, filedialog
 from generator import PostGenerator, BrandProfile
-from scheduler import Scheduler
+from scheduler import Scheduler, ScheduledPostDispatcher
+from publisher import PublishPool
 import csv
 import os
 import threading
 import time
-import requests
 
-from PIL import Image, ImageTk
+from PIL import ImageTk
 from tkinter import simpledialog
 from tkinter import ttk
 import tkinter.font as tkfont
 
 # --- Modern styling setup -------------------------------------------------
-# Configure a clean ttk theme and default fonts/colors.
-_style = ttk.Style()
-try:
-    _style.theme_use("clam")
-except Exception:
-    pass
-
-# choose an Apple-like font when available, otherwise fall back
-_candidates = ["SF Pro Text", "Helvetica Neue", "Helvetica", "Segoe UI", "Arial"]
-try:
-    _families = set(tkfont.families())
-except Exception:
-    _families = set()
-_FONT_FAMILY = next((f for f in _candidates if f in _families), "TkDefaultFont")
-FONT_BODY = tkfont.Font(family=_FONT_FAMILY, size=11)
-FONT_TITLE = tkfont.Font(family=_FONT_FAMILY, size=13, weight="bold")
-
 # color palette
 _BG = "#F5F7FA"
 _CARD = "#FFFFFF"
 _ACCENT = "#007AFF"  # iOS blue
 _TEXT = "#111827"
 
-_style.configure("TButton", font=FONT_BODY, foreground=_ACCENT, padding=6)
-_style.configure("TLabel", font=FONT_BODY, foreground=_TEXT, background=_BG)
-_style.configure("TEntry", font=FONT_BODY)
-_style.configure("Card.TFrame", background=_CARD)
+
+def setup_style(root):
+    """Configure a clean ttk theme and default fonts/colors.
+
+    Called from App rather than at import time: ingest's spawn workers import
+    this module as ``__mp_main__`` and must not create a Tk root.
+    """
+    style = ttk.Style(root)
+    try:
+        style.theme_use("clam")
+    except Exception:
+        pass
+
+    # choose an Apple-like font when available, otherwise fall back
+    candidates = ["SF Pro Text", "Helvetica Neue", "Helvetica", "Segoe UI", "Arial"]
+    try:
+        families = set(tkfont.families(root))
+    except Exception:
+        families = set()
+    family = next((f for f in candidates if f in families), "TkDefaultFont")
+    font_body = tkfont.Font(root, family=family, size=11)
+
+    style.configure("TButton", font=font_body, foreground=_ACCENT, padding=6)
+    style.configure("TLabel", font=font_body, foreground=_TEXT, background=_BG)
+    style.configure("TEntry", font=font_body)
+    style.configure("Card.TFrame", background=_CARD)
 # -------------------------------------------------------------------------
 
 # connectors
 from connectors import StubConnector, FacebookConnector
 import storage
 import image_utils
+import thumb_cache
 
 APP_TITLE = "Social Media Post Generator"
 
@@ -54,6 +60,7 @@ APP_TITLE = "Social Media Post Generator"
 class App:
     def __init__(self, root):
         self.root = root
+        setup_style(root)
         self.root.title(APP_TITLE)
         self.root.geometry("820x680")
 
@@ -63,6 +70,10 @@ class App:
         self.generator = PostGenerator()
         self.scheduler = Scheduler()
 
+        # parse the brand profile once and re-parse only when settings change it
+        self.brand = self._parse_brand(storage.get_setting("BRAND_PROFILE"))
+        storage.subscribe_setting(self._on_brand_changed, "BRAND_PROFILE")
+
         # Topic input
         ttk.Label(self.root, text="Topic / Focus:").pack(anchor="w", padx=8, pady=(8, 0))
         self.topic_entry = ttk.Entry(self.root)
@@ -109,7 +120,7 @@ class App:
         ttk.Button(frame, text="Schedule Post", command=self.schedule_post).pack(side="left")
         ttk.Button(frame, text="Preview & Post", command=self.preview_and_post).pack(side="left", padx=6)
         ttk.Button(frame, text="Toggle Logs", command=self.toggle_logs).pack(side="left", padx=6)
-        ttk.Button(frame, text="Quit", command=self.root.quit).pack(side="right")
+        ttk.Button(frame, text="Quit", command=self._on_close).pack(side="right")
 
         # Connector selection and dry-run toggle
         conn_frame = ttk.Frame(self.root, style="Card.TFrame")
@@ -123,10 +134,24 @@ class App:
         ttk.Button(conn_frame, text="Settings", command=self.open_settings).pack(side="right")
         ttk.Button(conn_frame, text="Image Library", command=self.open_image_library).pack(side="right", padx=8)
 
-        # start a background poller for scheduled posts
-        self._stop_poller = False
-        t = threading.Thread(target=self._poll_scheduled_loop, daemon=True)
-        t.start()
+        # publish stored scheduled posts as they fall due, several at a time.
+        # Scheduled posts always use Facebook in dry-run mode to avoid accidental posting.
+        self.publish_pool = PublishPool(
+            {"Facebook": lambda: FacebookConnector(dry_run=True), "Stub": StubConnector},
+            default_connector="Facebook",
+        )
+        # rebuild the connector when its stored credentials change
+        storage.subscribe_setting(self.publish_pool.reset_connectors, "FB_PAGE_ID")
+        storage.subscribe_setting(self.publish_pool.reset_connectors, "FB_ACCESS_TOKEN")
+        # other bot processes may share .bot.db; re-check at least once per lease period
+        # so their posts and expired leases are picked up without a wakeup from them
+        self.dispatcher = ScheduledPostDispatcher(pool=self.publish_pool, max_sleep=storage.DEFAULT_LEASE_SECONDS)
+        self.dispatcher.start()
+        # archive old sent posts and compact .bot.db periodically
+        self.scheduler.schedule(60, self._run_maintenance)
+        # closing the window must drain the publish reporter, or posts left
+        # in_flight are published again once their lease expires
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
 
         # status bar and progress
         self.status_var = tk.StringVar(value="")
@@ -137,6 +162,39 @@ class App:
         self.progress = ttk.Progressbar(status_frame, mode="indeterminate")
         # initially hidden
 
+    def _on_close(self):
+        try:
+            self.dispatcher.stop()
+            self.publish_pool.shutdown()
+            self.scheduler.shutdown(wait=False)
+        finally:
+            self.root.destroy()
+
+    @staticmethod
+    def _parse_brand(brand_raw):
+        if not brand_raw:
+            return None
+        try:
+            import json
+
+            j = json.loads(brand_raw)
+            return BrandProfile(name=j.get("name", ""), keywords=j.get("keywords", []), banned=j.get("banned", []))
+        except Exception:
+            return None
+
+    def _on_brand_changed(self, key, value):
+        self.brand = self._parse_brand(value)
+
+    def _run_maintenance(self):
+        try:
+            res = storage.run_maintenance()
+            if res["archived"]:
+                self.append_log(f"Archived {res['archived']} sent scheduled posts")
+        except Exception as e:
+            self.append_error(e, "Storage maintenance failed:")
+        finally:
+            self.scheduler.schedule(storage.MAINTENANCE_INTERVAL, self._run_maintenance)
+
     def show_progress(self, text: str = ""):
         try:
             self.status_var.set(text)
@@ -223,17 +281,8 @@ class App:
             messagebox.showwarning("Missing topic", "Please enter a topic or focus for the post.")
             return
 
-        # load brand profile from storage (fast)
-        brand_raw = storage.get_setting("BRAND_PROFILE")
-        brand = None
-        if brand_raw:
-            try:
-                import json
-
-                j = json.loads(brand_raw)
-                brand = BrandProfile(name=j.get("name", ""), keywords=j.get("keywords", []), banned=j.get("banned", []))
-            except Exception:
-                brand = None
+        # brand profile is kept current by the settings subscription
+        brand = self.brand
 
         # run generation in background to keep UI responsive
         def do_generate():
@@ -307,12 +356,22 @@ class App:
             if not url:
                 return
             out = os.path.join(os.getcwd(), ".tmp_image.jpg")
-            try:
-                image_utils.download_image(url, out)
-                self.selected_image_path = out
-                self.selected_image_label.config(text=os.path.basename(out))
-            except Exception as e:
-                messagebox.showerror("Download failed", str(e))
+
+            def do_download():
+                try:
+                    image_utils.download_image(url, out)
+                except Exception as e:
+                    self.root.after(0, lambda err=e: messagebox.showerror("Download failed", str(err)))
+                    return
+
+                def done():
+                    self.selected_image_path = out
+                    self.selected_image_label.config(text=os.path.basename(out))
+
+                self.root.after(0, done)
+                self._warn_if_in_library(out)
+
+            threading.Thread(target=do_download, daemon=True).start()
             return
         if opt == "ai":
             prompt = simpledialog.askstring("AI image text", "Enter short text for image generation (brand/phrase):")
@@ -341,6 +400,35 @@ class App:
             except Exception as e:
                 messagebox.showerror("Generate failed", str(e))
 
+    def _library_duplicates(self, phash) -> str:
+        """Describe library images that are near-duplicates of ``phash`` ("" if none)."""
+        if not phash:
+            return ""
+        try:
+            import image_db
+            import phash_index
+
+            lines = []
+            for image_id, dist in phash_index.find_near_duplicates(phash)[:5]:
+                img = image_db.get_image(image_id)
+                if img:
+                    lines.append(f"{image_id}: {img['title'] or os.path.basename(img['path'])} (distance {dist})")
+            return "\n".join(lines)
+        except Exception:
+            return ""
+
+    def _warn_if_in_library(self, path: str):
+        """Warn (on the Tk thread) when ``path`` matches a library image; call from a worker thread."""
+        try:
+            dupes = self._library_duplicates(image_utils.compute_image_metadata(path).get("phash"))
+        except Exception:
+            return
+        if dupes:
+            self.root.after(
+                0,
+                lambda: messagebox.showinfo("Already in library", f"The downloaded image looks like one already in the library:\n{dupes}"),
+            )
+
     def preview_and_post(self):
         content = self.preview.get("1.0", tk.END).strip()
         if not content:
@@ -350,16 +438,7 @@ class App:
         # attempt to enrich with metadata if available in background
         topic = self.topic_entry.get().strip()
         tone = self.tone_entry.get().strip() or "friendly"
-        brand_raw = storage.get_setting("BRAND_PROFILE")
-        brand = None
-        if brand_raw:
-            try:
-                import json
-
-                j = json.loads(brand_raw)
-                brand = BrandProfile(name=j.get("name", ""), keywords=j.get("keywords", []), banned=j.get("banned", []))
-            except Exception:
-                brand = None
+        brand = self.brand
 
         def do_metadata():
             try:
@@ -415,8 +494,7 @@ class App:
         photo = None
         if image_path and os.path.exists(image_path):
             try:
-                img = Image.open(image_path)
-                img.thumbnail((560, 300))
+                img = thumb_cache.load_thumbnail(image_path, (560, 300))
                 photo = ImageTk.PhotoImage(img)
                 img_label = tk.Label(win, image=photo)
                 img_label.image = photo
@@ -623,13 +701,76 @@ class App:
         win.title("Image Library")
         win.geometry("700x500")
 
-        listbox = tk.Listbox(win)
-        listbox.pack(fill="both", expand=True, padx=8, pady=8)
+        # optional full-text search, prefilled with the post topic, and tag filter (comma separated, all must match)
+        filter_frame = tk.Frame(win)
+        filter_frame.pack(fill="x", padx=8, pady=(8, 0))
+        tk.Label(filter_frame, text="Search:").pack(side="left")
+        search_query = tk.StringVar()
+        search_entry = tk.Entry(filter_frame, textvariable=search_query)
+        search_entry.pack(side="left", fill="x", expand=True, padx=4)
+        tk.Label(filter_frame, text="Tags:").pack(side="left")
+        tag_filter = tk.StringVar()
+        tag_entry = tk.Entry(filter_frame, textvariable=tag_filter)
+        tag_entry.pack(side="left", fill="x", expand=True, padx=4)
+
+        list_frame = tk.Frame(win)
+        list_frame.pack(fill="both", expand=True, padx=8, pady=8)
+        scrollbar = tk.Scrollbar(list_frame, orient="vertical")
+        listbox = tk.Listbox(list_frame)
+        scrollbar.config(command=listbox.yview)
+        scrollbar.pack(side="right", fill="y")
+        listbox.pack(side="left", fill="both", expand=True)
+
+        # rows are fetched a page at a time as the user scrolls towards the end
+        page_size = 200
+        paging = {"after_id": None, "done": False}
+
+        def load_page():
+            if paging["done"]:
+                return
+            query = search_query.get().strip()
+            tags = [t.strip() for t in tag_filter.get().split(",") if t.strip()]
+            if query:
+                # ranked best match first; a single page is enough
+                rows = image_db.search_images_local(query, limit=page_size, match_all=False, columns=("title", "path"))
+                if tags:
+                    wanted = {r["id"] for r in image_db.images_with_tags(all_of=tags, limit=10000, columns=())}
+                    rows = [r for r in rows if r["id"] in wanted]
+                paging["done"] = True
+            elif tags:
+                rows = image_db.images_with_tags(all_of=tags, after_id=paging["after_id"], limit=page_size, columns=("title", "path"))
+            else:
+                rows = image_db.list_images_page(paging["after_id"], page_size, columns=("title", "path"))
+            for img in rows:
+                listbox.insert(tk.END, f"{img['id']}: {img['title']} ({os.path.basename(img['path'])})")
+            if rows:
+                paging["after_id"] = rows[-1]["id"]
+            if len(rows) < page_size:
+                paging["done"] = True
+
+        def on_scroll(first, last):
+            scrollbar.set(first, last)
+            if float(last) > 0.9 and not paging["done"]:
+                win.after_idle(load_page)
+
+        listbox.config(yscrollcommand=on_scroll)
 
         def refresh_list():
             listbox.delete(0, tk.END)
-            for img in image_db.list_images():
-                listbox.insert(tk.END, f"{img['id']}: {img['title']} ({os.path.basename(img['path'])})")
+            paging["after_id"] = None
+            paging["done"] = False
+            load_page()
+
+        tk.Button(filter_frame, text="Filter", command=refresh_list).pack(side="left")
+
+        def search_topic():
+            search_query.set(self.topic_entry.get().strip())
+            refresh_list()
+
+        # the library opens unfiltered; this narrows it to the post's topic on request
+        tk.Button(filter_frame, text="Match Topic", command=search_topic).pack(side="left", padx=(4, 0))
+        tag_entry.bind("<Return>", lambda evt: refresh_list())
+        search_entry.bind("<Return>", lambda evt: refresh_list())
 
         def add_image():
             path = filedialog.askopenfilename(filetypes=[("Image files", "*.png;*.jpg;*.jpeg;*.gif;*.bmp")])
@@ -638,11 +779,46 @@ class App:
             title = simpledialog.askstring("Title", "Enter title for image:") or ""
             desc = simpledialog.askstring("Description", "Enter description (optional):") or ""
             tags = simpledialog.askstring("Tags", "Comma separated tags (optional):") or ""
-            try:
-                image_db.add_image(path, title=title, description=desc, tags=[t.strip() for t in tags.split(",") if t.strip()], metadata={})
-                refresh_list()
-            except Exception as e:
-                messagebox.showerror("Add failed", str(e))
+            tag_list = [t.strip() for t in tags.split(",") if t.strip()]
+
+            def confirm_update(existing, img):
+                name = img.get("title") or os.path.basename(img.get("path") or "")
+                if messagebox.askyesno(
+                    "Already in library",
+                    f"This file is already in the library as {existing}: {name}\n\nApply the entered title, description and tags to it?",
+                    parent=win,
+                ):
+                    image_db.update_image(existing, title=title or None, description=desc or None, tags=tag_list or None)
+                    refresh_list()
+
+            def confirm_add(meta, dupes):
+                if dupes and not messagebox.askyesno(
+                    "Possible duplicate", f"This looks like an image already in the library:\n{dupes}\n\nAdd it anyway?", parent=win
+                ):
+                    return
+                try:
+                    image_db.add_image(path, title=title, description=desc, tags=tag_list, metadata=meta)
+                    refresh_list()
+                except Exception as e:
+                    messagebox.showerror("Add failed", str(e), parent=win)
+
+            # hashing, decoding and the first BK-tree build happen off the Tk thread
+            def do_check():
+                try:
+                    # same bytes already in the library: no decode, offer to update the existing entry
+                    existing = image_db.find_by_hash(image_utils.file_sha256(path))
+                    if existing is not None:
+                        img = image_db.get_image(existing) or {}
+                        self.root.after(0, lambda: confirm_update(existing, img))
+                        return
+                    meta = image_utils.compute_image_metadata(path)
+                    dupes = self._library_duplicates(meta.get("phash"))
+                except Exception as e:
+                    self.root.after(0, lambda err=e: messagebox.showerror("Add failed", str(err), parent=win))
+                    return
+                self.root.after(0, lambda: confirm_add(meta, dupes))
+
+            threading.Thread(target=do_check, daemon=True).start()
 
         def view_selected():
             sel = listbox.curselection()
@@ -658,8 +834,7 @@ class App:
             pv = tk.Toplevel(win)
             pv.title(img.get("title") or f"Image {image_id}")
             try:
-                im = Image.open(img["path"])
-                im.thumbnail((560, 360))
+                im = thumb_cache.load_thumbnail(img["path"], (560, 360))
                 photo = ImageTk.PhotoImage(im)
                 l = tk.Label(pv, image=photo)
                 l.image = photo
@@ -681,17 +856,7 @@ class App:
             if not img:
                 messagebox.showerror("Not found", "Image not found")
                 return
-            # build brand profile from storage
-            brand_raw = storage.get_setting("BRAND_PROFILE")
-            brand = None
-            if brand_raw:
-                try:
-                    import json
-
-                    j = json.loads(brand_raw)
-                    brand = BrandProfile(name=j.get("name", ""), keywords=j.get("keywords", []), banned=j.get("banned", []))
-                except Exception:
-                    brand = None
+            brand = self.brand
             post = self.generator.generate_from_image(img, tone="friendly", brand=brand)
             # insert into main preview
             self.preview.delete("1.0", tk.END)
@@ -708,34 +873,28 @@ class App:
             if not src:
                 messagebox.showerror("Not found", "Image not found")
                 return
-            # simple similarity: compare average color distance and size
-            def color_dist(a, b):
-                if not a or not b:
-                    return float("inf")
-                return sum((a[i] - b[i]) ** 2 for i in range(3)) ** 0.5
-
-            candidates = []
-            for img in image_db.list_images():
-                if img["id"] == image_id:
-                    continue
-                a = src.get("metadata", {}).get("avg_color")
-                b = img.get("metadata", {}).get("avg_color")
-                d = color_dist(a, b)
-                # also size diff
-                sw = src.get("metadata", {}).get("width") or 0
-                sh = src.get("metadata", {}).get("height") or 0
-                iw = img.get("metadata", {}).get("width") or 0
-                ih = img.get("metadata", {}).get("height") or 0
-                size_diff = abs(sw - iw) + abs(sh - ih)
-                score = d + (size_diff / 100.0)
-                candidates.append((score, img))
-            candidates.sort(key=lambda x: x[0])
-            # show top 5
-            if not candidates:
-                messagebox.showinfo("No matches", "No other images to compare")
-                return
-            out = "Similar images:\n" + "\n".join([f"{c[1]['id']}: {c[1]['title']} ({os.path.basename(c[1]['path'])})" for c in candidates[:5]])
-            messagebox.showinfo("Search results", out)
+            # ranked by average color distance and size, from the in-memory feature index
+            def do_search():
+                try:
+                    import similarity_index
+
+                    matches = [(score, image_db.get_image(mid)) for mid, score in similarity_index.find_similar(image_id, k=5)]
+                except Exception as e:
+                    self.root.after(0, lambda err=e: messagebox.showerror("Find similar failed", str(err)))
+                    return
+
+                def show():
+                    candidates = [c for c in matches if c[1]]
+                    if not candidates:
+                        messagebox.showinfo("No matches", "No other images to compare")
+                        return
+                    out = "Similar images:\n" + "\n".join([f"{c[1]['id']}: {c[1]['title']} ({os.path.basename(c[1]['path'])})" for c in candidates])
+                    messagebox.showinfo("Search results", out)
+
+                self.root.after(0, show)
+
+            # the first search loads the index; keep it off the Tk thread
+            threading.Thread(target=do_search, daemon=True).start()
 
         def caption_selected():
             sel = listbox.curselection()
@@ -762,9 +921,37 @@ class App:
             except Exception as e:
                 messagebox.showerror("Caption failed", str(e))
 
+        def import_folder():
+            folder = filedialog.askdirectory(parent=win)
+            if not folder:
+                return
+
+            def progress(done, total):
+                self.root.after(0, lambda: self.status_var.set(f"Importing images: {done}/{total}"))
+
+            def do_import():
+                try:
+                    import ingest
+
+                    stats = ingest.ingest_directory(folder, progress=progress)
+                    msg = (
+                        f"Added {stats['added']}, updated {stats['refreshed']}, skipped {stats['skipped'] + stats['duplicates']} "
+                        f"already imported, {stats['failed']} unreadable"
+                    )
+                    self.root.after(0, lambda: messagebox.showinfo("Import finished", msg))
+                    self.root.after(0, refresh_list)
+                except Exception as e:
+                    self.root.after(0, lambda err=e: messagebox.showerror("Import failed", str(err)))
+                finally:
+                    self.root.after(0, self.hide_progress)
+
+            self.show_progress("Importing images...")
+            threading.Thread(target=do_import, daemon=True).start()
+
         btns = tk.Frame(win)
         btns.pack(fill="x", padx=8, pady=(0, 8))
         tk.Button(btns, text="Add Image", command=add_image).pack(side="left")
+        tk.Button(btns, text="Import Folder", command=import_folder).pack(side="left", padx=8)
         tk.Button(btns, text="View Selected", command=view_selected).pack(side="left", padx=8)
         tk.Button(btns, text="Generate Post", command=generate_from_selected).pack(side="left", padx=8)
         tk.Button(btns, text="Caption", command=caption_selected).pack(side="left", padx=8)
@@ -788,16 +975,7 @@ class App:
         def fetch_and_render():
             try:
                 # get metadata
-                try:
-                    brand_raw = storage.get_setting("BRAND_PROFILE")
-                    brand = None
-                    if brand_raw:
-                        import json
-
-                        j = json.loads(brand_raw)
-                        brand = BrandProfile(name=j.get("name", ""), keywords=j.get("keywords", []), banned=j.get("banned", []))
-                except Exception:
-                    brand = None
+                brand = self.brand
 
                 try:
                     meta = self.generator.generate_with_metadata(topic=topic, tone=tone, brand=brand)
@@ -831,16 +1009,37 @@ class App:
                     grid.pack(fill="both", expand=True)
 
                     def on_select(url):
+                        out = os.path.join(os.getcwd(), ".tmp_image_found.jpg")
+
+                        def do_download():
+                            try:
+                                image_utils.download_image_to(out, url)
+                            except Exception as e:
+                                self.root.after(0, lambda err=e: messagebox.showerror("Download failed", str(err)))
+                                return
+
+                            def done():
+                                self.selected_image_path = out
+                                self.selected_image_label.config(text=os.path.basename(out))
+                                messagebox.showinfo("Selected", f"Image downloaded to {out}")
+
+                            self.root.after(0, done)
+                            self._warn_if_in_library(out)
+
+                        threading.Thread(target=do_download, daemon=True).start()
+
+                    def load_thumb(fut, label):
                         try:
-                            out = os.path.join(os.getcwd(), ".tmp_image_found.jpg")
-                            import image_utils
+                            im = fut.result()
+                        except Exception:
+                            return
 
-                            image_utils.download_image_to(out, url)
-                            self.selected_image_path = out
-                            self.selected_image_label.config(text=os.path.basename(out))
-                            messagebox.showinfo("Selected", f"Image downloaded to {out}")
-                        except Exception as e:
-                            messagebox.showerror("Download failed", str(e))
+                        def put_image():
+                            photo = ImageTk.PhotoImage(im)
+                            label.config(image=photo, text="")
+                            label.image = photo
+
+                        self.root.after(0, put_image)
 
                     for i, s in enumerate(suggestions):
                         fr = tk.Frame(grid, bd=1, relief="groove")
@@ -851,28 +1050,12 @@ class App:
                         btn = tk.Button(fr, text="Select", command=lambda url=s.get("url"): on_select(url))
                         btn.pack(pady=4)
 
-                        # load thumbnail in background per-item
-                        def load_thumb(idx, info, label):
-                            try:
-                                img_url = info.get("thumbnail") or info.get("url")
-                                r = requests.get(img_url, stream=True, timeout=10)
-                                r.raise_for_status()
-                                tmp = os.path.join(os.getcwd(), f".tmp_thumb_{idx}.jpg")
-                                with open(tmp, "wb") as f:
-                                    for chunk in r.iter_content(2048):
-                                        if chunk:
-                                            f.write(chunk)
-                                im = Image.open(tmp)
-                                im.thumbnail((220, 140))
-                                photo = ImageTk.PhotoImage(im)
-                                def put_image():
-                                    label.config(image=photo, text="")
-                                    label.image = photo
-                                self.root.after(0, put_image)
-                            except Exception:
-                                pass
-
-                        threading.Thread(target=load_thumb, args=(i, s, lbl), daemon=True).start()
+                        # decoded in memory on a shared pool; PhotoImage is made on the Tk thread
+                        img_url = s.get("thumbnail") or s.get("url")
+                        if img_url:
+                            thumb_cache.url_thumbnail(img_url, (220, 140)).add_done_callback(
+                                lambda f, label=lbl: load_thumb(f, label)
+                            )
 
                 self.root.after(0, render)
             finally:
@@ -880,30 +1063,6 @@ class App:
 
         threading.Thread(target=fetch_and_render, daemon=True).start()
 
-    def _poll_scheduled_loop(self):
-        # simple poll loop that runs every 30 seconds
-        while not getattr(self, "_stop_poller", False):
-            now = int(time.time())
-            try:
-                rows = storage.list_scheduled()
-                for r in rows:
-                    if r["status"] != "pending":
-                        continue
-                    if r["run_at"] <= now:
-                        # perform post
-                        content = r["content"]
-                        try:
-                            conn = FacebookConnector(dry_run=True)
-                            # use stored page/token; respect dry_run true to avoid accidental posting
-                            res = conn.post(content)
-                            storage.mark_scheduled_sent(r["id"])
-                        except Exception:
-                            # leave as pending for retry
-                            pass
-            except Exception:
-                pass
-            time.sleep(30)
-
 
 if __name__ == "__main__":
     root = tk.Tk()
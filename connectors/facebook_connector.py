@@ -1,7 +1,7 @@
 import os
 import json
 from typing import Optional
-import requests
+import http_client
 from storage import get_setting
 
 
@@ -46,7 +46,7 @@ class FacebookConnector:
             # If the Graph API requires multipart upload use 'source' instead (not implemented here)
             files = {"source": open(image_path, "rb")}
         # Note: to attach alt text you would need to call the media endpoint with 'alt_text' metadata as supported by the Graph API.
-        resp = requests.post(url, data=payload, files=files, timeout=30)
+        resp = http_client.post(url, data=payload, files=files)
         if files:
             files["source"].close()
         resp.raise_for_status()
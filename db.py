@@ -0,0 +1,133 @@
+"""Shared SQLite connection handling for the bot's local databases.
+
+Connections are kept open per thread and per database file instead of being
+opened and closed for every query. Each connection runs in WAL mode so readers
+never block on the writer; writes are serialized per database file by a lock
+and run inside an explicit ``BEGIN IMMEDIATE`` transaction.
+
+Usage:
+    with db.read(path) as conn:
+        conn.execute("SELECT ...")
+    with db.write(path) as conn:
+        conn.execute("UPDATE ...")
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+# seconds a connection waits on a lock held by another process before failing
+BUSY_TIMEOUT = 10.0
+# number of compiled statements kept per connection
+STATEMENT_CACHE_SIZE = 256
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    # NORMAL is durable in WAL mode except for the last commits on power loss
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    # negative value is KiB: ~8MB page cache per connection
+    "PRAGMA cache_size=-8000",
+    "PRAGMA foreign_keys=ON",
+)
+
+_local = threading.local()
+_write_locks: Dict[str, threading.Lock] = {}
+_write_locks_guard = threading.Lock()
+
+
+def _key(path: str) -> str:
+    return path if path == ":memory:" else os.path.abspath(path)
+
+
+def _open(path: str) -> sqlite3.Connection:
+    # isolation_level=None: autocommit, transactions are opened explicitly in write()
+    conn = sqlite3.connect(
+        path,
+        timeout=BUSY_TIMEOUT,
+        isolation_level=None,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def connection(path: str) -> sqlite3.Connection:
+    """Return this thread's connection to ``path``, opening it on first use."""
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    key = _key(path)
+    conn = conns.get(key)
+    if conn is None:
+        conn = conns[key] = _open(path)
+    return conn
+
+
+def _write_lock(path: str) -> threading.Lock:
+    key = _key(path)
+    with _write_locks_guard:
+        lock = _write_locks.get(key)
+        if lock is None:
+            lock = _write_locks[key] = threading.Lock()
+        return lock
+
+
+@contextmanager
+def read(path: str) -> Iterator[sqlite3.Connection]:
+    """Yield a connection for read-only queries. Readers run concurrently."""
+    yield connection(path)
+
+
+@contextmanager
+def write(path: str) -> Iterator[sqlite3.Connection]:
+    """Yield a connection inside a write transaction, committed on exit.
+
+    Writers in this process are serialized by a per-file lock; ``BEGIN
+    IMMEDIATE`` takes SQLite's write lock up front so writers in other
+    processes wait on ``busy_timeout`` instead of failing mid-transaction.
+    """
+    conn = connection(path)
+    with _write_lock(path):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+@contextmanager
+def exclusive(path: str) -> Iterator[sqlite3.Connection]:
+    """Yield a connection holding this process's write lock but outside any transaction.
+
+    For statements that cannot run inside a transaction, such as VACUUM or
+    changing ``auto_vacuum``.
+    """
+    conn = connection(path)
+    with _write_lock(path):
+        yield conn
+
+
+def ensure_columns(conn: sqlite3.Connection, table: str, columns: Dict[str, str]):
+    """Add any of ``columns`` (name -> SQL type) missing from an existing table."""
+    existing = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+    for name, decl in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+
+def close(path: str = None):
+    """Close this thread's connections (all of them, or only the one to ``path``)."""
+    conns = getattr(_local, "conns", None)
+    if not conns:
+        return
+    keys = [_key(path)] if path is not None else list(conns)
+    for key in keys:
+        conn = conns.pop(key, None)
+        if conn is not None:
+            conn.close()
@@ -0,0 +1,91 @@
+"""Size-capped least-recently-used eviction for an on-disk cache directory.
+
+A file's mtime is its last use: callers touch() it on every hit. Once the
+files under a directory add up to more than the cap, the least recently
+used are deleted until the total is back under ``LOW_WATER`` of the cap, so
+eviction does not run again on the very next write. The running total is
+computed by one directory walk on first use and then kept incrementally.
+
+Usage:
+    _lru = disk_lru.DiskLRU()
+    disk_lru.touch(path)                                # on a hit
+    removed = _lru.added(cache_dir, nbytes, max_bytes)  # after writing a file
+"""
+import os
+import threading
+from typing import Dict, List, Tuple
+
+# eviction frees space down to this fraction of the cap
+LOW_WATER = 0.8
+
+
+def touch(path: str) -> bool:
+    """Mark ``path`` as just used; False if it does not exist."""
+    try:
+        os.utime(path)
+        return True
+    except OSError:
+        return False
+
+
+def scan(root: str) -> List[Tuple[float, int, str]]:
+    """``(mtime, size, path)`` for every file under ``root``."""
+    entries = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            p = os.path.join(dirpath, name)
+            try:
+                st = os.stat(p)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+    return entries
+
+
+class DiskLRU:
+    """Running size totals and LRU eviction for cache directories."""
+
+    def __init__(self, low_water: float = LOW_WATER):
+        self.low_water = low_water
+        self._lock = threading.Lock()
+        self._totals: Dict[str, int] = {}
+
+    def added(self, root: str, nbytes: int, max_bytes: int) -> List[str]:
+        """Account for ``nbytes`` written under ``root``; evict if over ``max_bytes`` and return the removed paths."""
+        with self._lock:
+            total = self._totals.get(root)
+            total = sum(size for _, size, _ in scan(root)) if total is None else total + nbytes
+            removed: List[str] = []
+            if total > max_bytes:
+                total, removed = self._evict(root, int(max_bytes * self.low_water))
+            self._totals[root] = total
+            return removed
+
+    def _evict(self, root: str, target: int) -> Tuple[int, List[str]]:
+        # least recently used first
+        entries = sorted(scan(root))
+        total = sum(size for _, size, _ in entries)
+        removed = []
+        for _, size, p in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(p)
+                total -= size
+                removed.append(p)
+            except OSError:
+                pass
+        return total, removed
+
+    def clear(self, root: str) -> List[str]:
+        """Delete every file under ``root`` and return their paths."""
+        with self._lock:
+            removed = []
+            for _, _, p in scan(root):
+                try:
+                    os.remove(p)
+                    removed.append(p)
+                except OSError:
+                    pass
+            self._totals[root] = 0
+            return removed
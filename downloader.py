@@ -0,0 +1,200 @@
+"""Download manager for remote images.
+
+Downloads run on a small shared thread pool; asking for a URL that is
+already being fetched returns the same future instead of a second request.
+Finished files are kept in an on-disk cache: blobs are named by the sha256
+of their bytes (two URLs serving the same image share one file) and a
+SQLite index maps each URL to its blob plus the ETag/Last-Modified it came
+with. A URL fetched within ``FRESH_SECONDS`` is served from disk without a
+request; an older one is revalidated with a conditional GET. Every download
+is capped at ``MAX_DOWNLOAD_BYTES`` and the cache at ``MAX_CACHE_BYTES``,
+evicting least recently used blobs.
+
+Usage:
+    path = downloader.download(url)          # blocking, returns the cached file
+    downloader.download_to(url, "out.jpg")   # copy of the cached file
+    future = downloader.fetch(url)           # non-blocking
+"""
+import hashlib
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+
+import db
+import disk_lru
+import http_client
+
+CACHE_DIR = os.path.join(os.getcwd(), ".download_cache")
+MAX_WORKERS = 4
+MAX_DOWNLOAD_BYTES = 25 * 1024 * 1024
+MAX_CACHE_BYTES = 500 * 1024 * 1024
+# seconds a cached URL is served without asking the server again
+FRESH_SECONDS = 24 * 60 * 60
+CHUNK_SIZE = 256 * 1024
+
+
+class DownloadTooLarge(ValueError):
+    pass
+
+
+_lock = threading.Lock()
+_inflight: Dict[str, Future] = {}
+_executor: Optional[ThreadPoolExecutor] = None
+_lru = disk_lru.DiskLRU()
+_initialized: set = set()
+
+
+def _index_path() -> str:
+    return os.path.join(CACHE_DIR, "index.sqlite3")
+
+
+def _blob_dir() -> str:
+    return os.path.join(CACHE_DIR, "blobs")
+
+
+def _blob_path(digest: str) -> str:
+    return os.path.join(_blob_dir(), digest[:2], digest)
+
+
+def _init():
+    path = _index_path()
+    if path in _initialized:
+        return
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with db.write(path) as conn:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS downloads (
+                url TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_downloads_sha256 ON downloads (sha256)")
+    with _lock:
+        _initialized.add(path)
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="download")
+        return _executor
+
+
+def fetch(url: str) -> Future:
+    """Start downloading ``url`` (or join the download already running) and return a future of the cached path."""
+    pool = _pool()
+    with _lock:
+        fut = _inflight.get(url)
+        if fut is None:
+            fut = _inflight[url] = pool.submit(_download, url)
+            fut.add_done_callback(lambda f, url=url: _done(url, f))
+        return fut
+
+
+def _done(url: str, fut: Future):
+    with _lock:
+        if _inflight.get(url) is fut:
+            del _inflight[url]
+
+
+def download(url: str, timeout: Optional[float] = None) -> str:
+    """Return the path of the cached copy of ``url``, downloading it if needed."""
+    return fetch(url).result(timeout)
+
+
+def download_to(url: str, path: str, timeout: Optional[float] = None) -> str:
+    """Copy the cached download of ``url`` to ``path`` and return ``path``."""
+    shutil.copyfile(download(url, timeout), path)
+    return path
+
+
+def _download(url: str) -> str:
+    _init()
+    with db.read(_index_path()) as conn:
+        entry = conn.execute(
+            "SELECT sha256, etag, last_modified, fetched_at FROM downloads WHERE url = ?", (url,)
+        ).fetchone()
+    headers = {}
+    if entry and os.path.exists(_blob_path(entry[0])):
+        blob = _blob_path(entry[0])
+        if time.time() - entry[3] < FRESH_SECONDS:
+            disk_lru.touch(blob)
+            return blob
+        if entry[1]:
+            headers["If-None-Match"] = entry[1]
+        if entry[2]:
+            headers["If-Modified-Since"] = entry[2]
+    else:
+        entry = None
+
+    with http_client.get(url, stream=True, headers=headers) as resp:
+        if resp.status_code == 304 and entry:
+            _store(url, entry[0], entry[1], entry[2])
+            disk_lru.touch(_blob_path(entry[0]))
+            return _blob_path(entry[0])
+        resp.raise_for_status()
+        length = int(resp.headers.get("Content-Length") or 0)
+        if length > MAX_DOWNLOAD_BYTES:
+            raise DownloadTooLarge(f"{url} is {length} bytes (limit {MAX_DOWNLOAD_BYTES})")
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = os.path.join(CACHE_DIR, f".{os.getpid()}.{threading.get_ident()}.part")
+        h = hashlib.sha256()
+        nbytes = 0
+        try:
+            with open(tmp, "wb") as f:
+                for chunk in resp.iter_content(CHUNK_SIZE):
+                    nbytes += len(chunk)
+                    if nbytes > MAX_DOWNLOAD_BYTES:
+                        raise DownloadTooLarge(f"{url} exceeds {MAX_DOWNLOAD_BYTES} bytes")
+                    h.update(chunk)
+                    f.write(chunk)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        finally:
+            http_client.record_bytes(url, nbytes)
+        etag, last_modified = resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+
+    digest = h.hexdigest()
+    blob = _blob_path(digest)
+    if os.path.exists(blob):
+        os.remove(tmp)
+        disk_lru.touch(blob)
+    else:
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        os.replace(tmp, blob)
+        _added(nbytes)
+    _store(url, digest, etag, last_modified)
+    return blob
+
+
+def _store(url: str, digest: str, etag: Optional[str], last_modified: Optional[str]):
+    with db.write(_index_path()) as conn:
+        conn.execute(
+            "REPLACE INTO downloads (url, sha256, etag, last_modified, fetched_at) VALUES (?, ?, ?, ?, ?)",
+            (url, digest, etag, last_modified, time.time()),
+        )
+
+
+def _added(nbytes: int):
+    removed = _lru.added(_blob_dir(), nbytes, MAX_CACHE_BYTES)
+    if removed:
+        with db.write(_index_path()) as conn:
+            conn.executemany("DELETE FROM downloads WHERE sha256 = ?", [(os.path.basename(p),) for p in removed])
+
+
+def clear():
+    """Delete every cached download."""
+    _init()
+    _lru.clear(_blob_dir())
+    with db.write(_index_path()) as conn:
+        conn.execute("DELETE FROM downloads")
@@ -1,5 +1,5 @@
 import os
-import requests
+import http_client
 from typing import Optional
 
 
@@ -30,17 +30,17 @@ class HFClient:
             if is_image:
                 # data expected to be a path to a file or binary bytes
                 if isinstance(data, (bytes, bytearray)):
-                    resp = requests.post(url, headers=headers, data=data, timeout=120)
+                    resp = http_client.post(url, headers=headers, data=data)
                 else:
                     with open(data, "rb") as f:
-                        resp = requests.post(url, headers=headers, data=f.read(), timeout=120)
+                        resp = http_client.post(url, headers=headers, data=f.read())
             else:
                 # allow passing dict for model-specific params
                 if isinstance(data, dict):
                     payload = data
                 else:
                     payload = {"inputs": data}
-                resp = requests.post(url, headers=headers, json=payload, timeout=120)
+                resp = http_client.post(url, headers=headers, json=payload)
             resp.raise_for_status()
             # Some HF models return binary (for image-generation) or json
             content_type = resp.headers.get("Content-Type", "")
@@ -0,0 +1,182 @@
+"""Shared HTTP layer for every outbound request the bot makes.
+
+One ``requests.Session`` is kept per scheme+host, so connections stay alive
+and are pooled instead of paying a TCP+TLS handshake per call. Each session
+retries connection errors and 429/5xx responses with exponential backoff
+(honouring Retry-After). POST is only retried for hosts configured with
+``retry_post=True``, since most POSTs are not safe to repeat. Every request
+gets a timeout, and per-host counters track requests, errors, retries, bytes
+and latency.
+
+Usage:
+    resp = http_client.get(url, params={...})
+    http_client.download_to(url, path)
+"""
+import threading
+import time
+from typing import Any, Dict, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+USER_AGENT = "SocialBot/1.0"
+# (connect, read) seconds
+DEFAULT_TIMEOUT: Tuple[float, float] = (5.0, 30.0)
+DEFAULT_HOST_CONFIG = {
+    "pool_connections": 4,
+    "pool_maxsize": 16,
+    "retries": 3,
+    "backoff_factor": 0.5,
+    "status_forcelist": (429, 500, 502, 503, 504),
+    "retry_post": False,
+    "timeout": DEFAULT_TIMEOUT,
+}
+# per-host overrides of DEFAULT_HOST_CONFIG
+HOST_CONFIG: Dict[str, Dict[str, Any]] = {
+    # inference calls are idempotent; 503 means the model is still loading
+    "api-inference.huggingface.co": {"retry_post": True, "timeout": (5.0, 120.0)},
+    "graph.facebook.com": {"timeout": (5.0, 30.0)},
+}
+
+_lock = threading.Lock()
+_sessions: Dict[str, requests.Session] = {}
+_stats: Dict[str, Dict[str, float]] = {}
+
+
+def _host_key(url: str) -> Tuple[str, str]:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}", parts.hostname or ""
+
+
+def host_config(host: str) -> Dict[str, Any]:
+    cfg = dict(DEFAULT_HOST_CONFIG)
+    cfg.update(HOST_CONFIG.get(host, {}))
+    return cfg
+
+
+def configure_host(host: str, **options):
+    """Override pool size, retries, backoff or timeout for ``host``; applies to new sessions."""
+    unknown = set(options) - set(DEFAULT_HOST_CONFIG)
+    if unknown:
+        raise ValueError(f"unknown options: {', '.join(sorted(unknown))}")
+    with _lock:
+        HOST_CONFIG.setdefault(host, {}).update(options)
+        # rebuild sessions for this host on next use
+        for base in [b for b in _sessions if urlsplit(b).hostname == host]:
+            _sessions.pop(base).close()
+
+
+def _build_session(host: str) -> requests.Session:
+    cfg = host_config(host)
+    methods = set(Retry.DEFAULT_ALLOWED_METHODS)
+    if cfg["retry_post"]:
+        methods.add("POST")
+    retry = Retry(
+        total=cfg["retries"],
+        connect=cfg["retries"],
+        read=cfg["retries"],
+        status=cfg["retries"],
+        backoff_factor=cfg["backoff_factor"],
+        status_forcelist=cfg["status_forcelist"],
+        allowed_methods=frozenset(methods),
+        respect_retry_after_header=True,
+        # the final 429/5xx is returned to the caller, who calls raise_for_status()
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=cfg["pool_connections"], pool_maxsize=cfg["pool_maxsize"], max_retries=retry)
+    s = requests.Session()
+    s.headers["User-Agent"] = USER_AGENT
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    return s
+
+
+def session(url: str) -> requests.Session:
+    """Return the pooled session for ``url``'s scheme and host."""
+    base, host = _host_key(url)
+    with _lock:
+        s = _sessions.get(base)
+        if s is None:
+            s = _sessions[base] = _build_session(host)
+        return s
+
+
+def _record(host: str, elapsed: float, nbytes: int = 0, error: bool = False, retries: int = 0):
+    with _lock:
+        st = _stats.setdefault(
+            host, {"requests": 0, "errors": 0, "retries": 0, "bytes": 0, "latency_total": 0.0, "latency_max": 0.0}
+        )
+        st["requests"] += 1
+        st["errors"] += int(error)
+        st["retries"] += retries
+        st["bytes"] += nbytes
+        st["latency_total"] += elapsed
+        st["latency_max"] = max(st["latency_max"], elapsed)
+
+
+def record_bytes(url: str, nbytes: int):
+    """Add bytes read from a streamed response to ``url``'s host counters."""
+    host = _host_key(url)[1]
+    with _lock:
+        if host in _stats:
+            _stats[host]["bytes"] += nbytes
+
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    """Send a request through the host's pooled session.
+
+    Takes the same arguments as ``requests.request``; ``timeout`` defaults to
+    the host's configured timeout. Latency is measured to the response
+    headers; for ``stream=True`` bytes are counted by the caller through
+    record_bytes() (download_to() does this).
+    """
+    host = _host_key(url)[1]
+    kwargs.setdefault("timeout", host_config(host)["timeout"])
+    start = time.perf_counter()
+    try:
+        resp = session(url).request(method, url, **kwargs)
+    except requests.RequestException:
+        _record(host, time.perf_counter() - start, error=True)
+        raise
+    retries = getattr(getattr(resp.raw, "retries", None), "history", None) or ()
+    nbytes = 0 if kwargs.get("stream") else len(resp.content)
+    _record(host, time.perf_counter() - start, nbytes, error=resp.status_code >= 400, retries=len(retries))
+    return resp
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+def download_to(url: str, path: str, chunk_size: int = 64 * 1024, **kwargs) -> str:
+    """Stream ``url`` into the file at ``path`` and return the path. Raises on HTTP errors."""
+    with get(url, stream=True, **kwargs) as r:
+        r.raise_for_status()
+        nbytes = 0
+        with open(path, "wb") as f:
+            for chunk in r.iter_content(chunk_size):
+                if chunk:
+                    f.write(chunk)
+                    nbytes += len(chunk)
+    record_bytes(url, nbytes)
+    return path
+
+
+def stats() -> Dict[str, Dict[str, float]]:
+    """Per-host counters: requests, errors, retries, bytes, latency_total, latency_max (seconds)."""
+    with _lock:
+        return {host: dict(st) for host, st in _stats.items()}
+
+
+def close_all():
+    """Close every pooled session (they are rebuilt on next use)."""
+    with _lock:
+        for s in _sessions.values():
+            s.close()
+        _sessions.clear()
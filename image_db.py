@@ -1,31 +1,307 @@
 import os
-import sqlite3
 import json
-from typing import List, Dict, Optional
+import re
+import sqlite3
+import threading
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import db
+from image_utils import file_sha256, phash_to_hex, phash_to_int
 
 DB_PATH = os.path.join(os.getcwd(), "image_db.sqlite3")
 
+LIST_COLUMNS = ("id", "path", "title", "description", "tags", "metadata")
+# the metadata dict is stored as typed columns plus a JSON object holding any other keys
+METADATA_COLUMNS = ("width", "height", "avg_r", "avg_g", "avg_b", "phash", "metadata")
+_SQL = {name: (name,) for name in LIST_COLUMNS}
+_SQL["metadata"] = METADATA_COLUMNS
+_COLUMNS = ", ".join(c for name in LIST_COLUMNS for c in _SQL[name])
+
+# called as cb(image_id, metadata) after an image is added or its metadata changes
+_subscribers: List[Callable[[int, Dict], None]] = []
+_subscribers_lock = threading.Lock()
+
 
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute(
-        """
-        CREATE TABLE IF NOT EXISTS images (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            path TEXT NOT NULL,
-            title TEXT,
-            description TEXT,
-            tags TEXT,
-            metadata TEXT
+    with db.write(DB_PATH) as conn:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS images (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                path TEXT NOT NULL,
+                title TEXT,
+                description TEXT,
+                tags TEXT,
+                metadata TEXT
+            )
+            """
+        )
+        has_typed = "width" in {r[1] for r in conn.execute("PRAGMA table_info(images)")}
+        # metadata promoted to columns; phash is the 64-bit perceptual hash as a signed INTEGER
+        db.ensure_columns(
+            conn,
+            "images",
+            {"width": "INTEGER", "height": "INTEGER", "avg_r": "INTEGER", "avg_g": "INTEGER", "avg_b": "INTEGER", "phash": "INTEGER"},
         )
+        if not has_typed:
+            # move known keys out of the JSON of existing rows
+            rows = conn.execute("SELECT id, metadata FROM images").fetchall()
+            updates = []
+            for image_id, meta_s in rows:
+                try:
+                    meta = json.loads(meta_s or "{}")
+                except ValueError:
+                    meta = {}
+                updates.append(_metadata_values(meta if isinstance(meta, dict) else {}) + (image_id,))
+            conn.executemany(
+                f"UPDATE images SET {', '.join(c + ' = ?' for c in METADATA_COLUMNS)} WHERE id = ?", updates
+            )
+        # file identity: sha256 of the bytes, and size/mtime at the last scan
+        db.ensure_columns(conn, "images", {"content_hash": "TEXT", "file_size": "INTEGER", "file_mtime": "REAL"})
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_images_path ON images (path)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_images_content_hash ON images (content_hash) WHERE content_hash IS NOT NULL")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_images_phash ON images (phash) WHERE phash IS NOT NULL")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_images_width ON images (width, height)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_images_height ON images (height)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_images_avg_color ON images (avg_r, avg_g, avg_b)")
+        has_tag_table = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'image_tags'"
+        ).fetchone()
+        # one row per (tag, image): the primary key is the index for tag lookups
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS image_tags (
+                tag TEXT NOT NULL,
+                image_id INTEGER NOT NULL REFERENCES images (id) ON DELETE CASCADE,
+                PRIMARY KEY (tag, image_id)
+            ) WITHOUT ROWID
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_image_tags_image ON image_tags (image_id)")
+        if not has_tag_table:
+            # migrate the comma-joined tags column of existing rows
+            for image_id, tags_s in conn.execute("SELECT id, tags FROM images WHERE tags != ''").fetchall():
+                _write_tags(conn, image_id, (tags_s or "").split(","))
+        _init_fts(conn)
+
+
+def _init_fts(conn):
+    """Create the full-text index over title/description/tags, kept in sync by triggers."""
+    has_fts = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'images_fts'").fetchone()
+    try:
+        conn.execute(
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS images_fts USING fts5(
+                title, description, tags,
+                content = 'images', content_rowid = 'id',
+                tokenize = 'unicode61 remove_diacritics 2'
+            )
+            """
+        )
+    except sqlite3.OperationalError:
+        # SQLite built without FTS5: search_images_local() falls back to LIKE
+        return
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS images_fts_insert AFTER INSERT ON images BEGIN
+            INSERT INTO images_fts (rowid, title, description, tags) VALUES (new.id, new.title, new.description, new.tags);
+        END
         """
     )
-    conn.commit()
-    conn.close()
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS images_fts_delete AFTER DELETE ON images BEGIN
+            INSERT INTO images_fts (images_fts, rowid, title, description, tags)
+            VALUES ('delete', old.id, old.title, old.description, old.tags);
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS images_fts_update AFTER UPDATE OF title, description, tags ON images BEGIN
+            INSERT INTO images_fts (images_fts, rowid, title, description, tags)
+            VALUES ('delete', old.id, old.title, old.description, old.tags);
+            INSERT INTO images_fts (rowid, title, description, tags) VALUES (new.id, new.title, new.description, new.tags);
+        END
+        """
+    )
+    if not has_fts:
+        # index rows that existed before the FTS table
+        conn.execute("INSERT INTO images_fts (images_fts) VALUES ('rebuild')")
+
+
+def subscribe(callback: Callable[[int, Dict], None]):
+    """Call ``callback(image_id, metadata)`` whenever an image is added or its metadata is updated."""
+    with _subscribers_lock:
+        _subscribers.append(callback)
+    return callback
+
+
+def unsubscribe(callback: Callable[[int, Dict], None]):
+    with _subscribers_lock:
+        if callback in _subscribers:
+            _subscribers.remove(callback)
+
+
+def _notify(image_id: int, metadata: Dict):
+    with _subscribers_lock:
+        callbacks = list(_subscribers)
+    for cb in callbacks:
+        try:
+            cb(image_id, metadata)
+        except Exception:
+            pass
+
+
+def _normalize_tags(tags) -> List[str]:
+    seen = []
+    for t in tags or []:
+        t = t.strip().lower()
+        if t and t not in seen:
+            seen.append(t)
+    return seen
+
+
+def _write_tags(conn, image_id: int, tags):
+    conn.execute("DELETE FROM image_tags WHERE image_id = ?", (image_id,))
+    conn.executemany(
+        "INSERT INTO image_tags (tag, image_id) VALUES (?, ?)", [(t, image_id) for t in _normalize_tags(tags)]
+    )
+
+
+def _metadata_values(metadata: Optional[Dict]) -> tuple:
+    """Split a metadata dict into the values of METADATA_COLUMNS (the last one is the JSON overflow)."""
+    extra = dict(metadata or {})
+    width = extra.pop("width", None)
+    height = extra.pop("height", None)
+    color = extra.pop("avg_color", None)
+    try:
+        r, g, b = color[0], color[1], color[2]
+    except (TypeError, IndexError, KeyError):
+        r = g = b = None
+    phash = phash_to_int(extra.pop("phash", None))
+    return width, height, r, g, b, phash, json.dumps(extra) if extra else None
+
+
+def _metadata_dict(width, height, r, g, b, phash, extra) -> Dict:
+    """Rebuild the metadata dict from METADATA_COLUMNS; keys whose column is NULL are left out."""
+    meta = json.loads(extra) if extra else {}
+    if width is not None:
+        meta["width"] = width
+    if height is not None:
+        meta["height"] = height
+    if r is not None:
+        meta["avg_color"] = [r, g, b]
+    if phash is not None:
+        meta["phash"] = phash_to_hex(phash)
+    return meta
+
+
+def _decode(name: str, value):
+    if name == "tags":
+        return [t for t in (value or "").split(",") if t]
+    if name in ("title", "description"):
+        return value or ""
+    return value
+
+
+def _row_to_dict(r, columns: Sequence[str] = LIST_COLUMNS) -> Dict:
+    if columns is not LIST_COLUMNS:
+        out = {}
+        i = 0
+        for name in columns:
+            if name == "metadata":
+                out[name] = _metadata_dict(*r[i : i + len(METADATA_COLUMNS)])
+                i += len(METADATA_COLUMNS)
+            else:
+                out[name] = _decode(name, r[i])
+                i += 1
+        return out
+    return {
+        "id": r[0],
+        "path": r[1],
+        "title": r[2] or "",
+        "description": r[3] or "",
+        "tags": [t for t in (r[4] or "").split(",") if t],
+        "metadata": _metadata_dict(*r[5:12]),
+    }
+
+
+def _select(columns: Sequence[str], table: str = "") -> str:
+    # SQL select list for a projection; "metadata" expands to its typed columns
+    prefix = f"{table}." if table else ""
+    return ", ".join(prefix + c for name in columns for c in _SQL[name])
+
+
+def _projection(columns: Optional[Sequence[str]]) -> Sequence[str]:
+    if columns is None:
+        return LIST_COLUMNS
+    unknown = set(columns) - set(LIST_COLUMNS)
+    if unknown:
+        raise ValueError(f"unknown columns: {', '.join(sorted(unknown))}")
+    # id is always returned: it is the pagination key
+    return ("id",) + tuple(c for c in columns if c != "id")
+
+
+def file_state(path: str) -> Optional[Tuple[int, float]]:
+    """``(size, mtime)`` of the file at ``path``, or None if it cannot be stat'ed."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime
+
+
+def _insert(conn, img: Dict) -> int:
+    tags = img.get("tags") or []
+    cur = conn.execute(
+        f"INSERT INTO images (path, title, description, tags, {', '.join(METADATA_COLUMNS)}, content_hash, file_size, file_mtime)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            img["path"],
+            img.get("title", ""),
+            img.get("description", ""),
+            ",".join(tags),
+            *_metadata_values(img.get("metadata")),
+            img.get("content_hash"),
+            img.get("file_size"),
+            img.get("file_mtime"),
+        ),
+    )
+    _write_tags(conn, cur.lastrowid, tags)
+    return cur.lastrowid
+
+
+def find_by_hash(content_hash: str) -> Optional[int]:
+    """Id of an image whose file has this sha256, if any."""
+    with db.read(DB_PATH) as conn:
+        r = conn.execute("SELECT id FROM images WHERE content_hash = ? LIMIT 1", (content_hash,)).fetchone()
+    return r[0] if r else None
 
 
 def add_image(path: str, title: str = "", description: str = "", tags: Optional[List[str]] = None, metadata: Optional[Dict] = None) -> int:
+    """Add an image and return its id.
+
+    If the file is already in the library (same path, size and mtime, or the
+    same bytes under any path) the existing id is returned without decoding
+    the image.
+    """
+    state = file_state(path)
+    content_hash = None
+    if state is not None:
+        with db.read(DB_PATH) as conn:
+            r = conn.execute(
+                "SELECT id FROM images WHERE path = ? AND file_size = ? AND file_mtime = ?", (path, *state)
+            ).fetchone()
+        if r:
+            return r[0]
+        try:
+            content_hash = file_sha256(path)
+        except OSError:
+            content_hash = None
+        existing = find_by_hash(content_hash) if content_hash else None
+        if existing is not None:
+            return existing
     # compute metadata if not provided
     if metadata is None:
         try:
@@ -34,67 +310,273 @@ def add_image(path: str, title: str = "", description: str = "", tags: Optional[
             metadata = compute_image_metadata(path)
         except Exception:
             metadata = {}
-    tags_s = ",".join(tags or [])
-    meta_s = json.dumps(metadata or {})
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("INSERT INTO images (path, title, description, tags, metadata) VALUES (?, ?, ?, ?, ?)", (path, title, description, tags_s, meta_s))
-    conn.commit()
-    id_ = c.lastrowid
-    conn.close()
-    return id_
+    img = {"path": path, "title": title, "description": description, "tags": tags, "metadata": metadata, "content_hash": content_hash}
+    if state is not None:
+        img["file_size"], img["file_mtime"] = state
+    with db.write(DB_PATH) as conn:
+        if content_hash:
+            # added by another thread or process while metadata was computed
+            r = conn.execute("SELECT id FROM images WHERE content_hash = ? LIMIT 1", (content_hash,)).fetchone()
+            if r:
+                return r[0]
+        image_id = _insert(conn, img)
+    _notify(image_id, metadata or {})
+    return image_id
+
+
+def add_images(images: Sequence[Dict]) -> List[int]:
+    """Insert many images in one transaction and return their ids, in order.
+
+    Each item takes add_image()'s keyword arguments (``path`` is required) plus
+    optional ``content_hash``, ``file_size`` and ``file_mtime``. Metadata is
+    stored as given, so compute it beforehand (see ingest.py).
+    """
+    with db.write(DB_PATH) as conn:
+        ids = [_insert(conn, img) for img in images]
+    for image_id, img in zip(ids, images):
+        _notify(image_id, img.get("metadata") or {})
+    return ids
+
+
+def update_files(updates: Sequence[Dict]):
+    """Store recomputed metadata and file state for many images in one transaction.
+
+    Each item has ``id``, ``metadata``, ``content_hash``, ``file_size`` and ``file_mtime``.
+    """
+    with db.write(DB_PATH) as conn:
+        conn.executemany(
+            f"UPDATE images SET {', '.join(c + ' = ?' for c in METADATA_COLUMNS)}, content_hash = ?, file_size = ?, file_mtime = ? WHERE id = ?",
+            [
+                (
+                    *_metadata_values(u.get("metadata")),
+                    u.get("content_hash"),
+                    u.get("file_size"),
+                    u.get("file_mtime"),
+                    u["id"],
+                )
+                for u in updates
+            ],
+        )
+    for u in updates:
+        _notify(u["id"], u.get("metadata") or {})
+
+
+def file_states() -> Dict[str, Tuple[int, Optional[int], Optional[float]]]:
+    """Map every library path to ``(id, file_size, file_mtime)`` as recorded at its last scan."""
+    with db.read(DB_PATH) as conn:
+        return {r[1]: (r[0], r[2], r[3]) for r in conn.execute("SELECT id, path, file_size, file_mtime FROM images")}
+
+
+def known_hashes() -> set:
+    """Return the set of content hashes already in the library."""
+    with db.read(DB_PATH) as conn:
+        return {r[0] for r in conn.execute("SELECT content_hash FROM images WHERE content_hash IS NOT NULL")}
 
 
 def list_images() -> List[Dict]:
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT id, path, title, description, tags, metadata FROM images ORDER BY id DESC")
-    rows = c.fetchall()
-    conn.close()
-    out = []
-    for r in rows:
-        out.append({
-            "id": r[0],
-            "path": r[1],
-            "title": r[2] or "",
-            "description": r[3] or "",
-            "tags": [t for t in (r[4] or "").split(",") if t],
-            "metadata": json.loads(r[5] or "{}"),
-        })
-    return out
+    with db.read(DB_PATH) as conn:
+        rows = conn.execute(f"SELECT {_COLUMNS} FROM images ORDER BY id DESC").fetchall()
+    return [_row_to_dict(r) for r in rows]
+
+
+def list_images_page(after_id: Optional[int] = None, limit: int = 200, columns: Optional[Sequence[str]] = None) -> List[Dict]:
+    """Return one page of images, newest first, starting below ``after_id``.
+
+    Pass the last ``id`` of a page as ``after_id`` to get the next one (keyset
+    pagination: each page is an index range scan, however deep it is).
+    ``columns`` limits what is read and decoded, e.g. ("title", "path") for a
+    listing that never touches the metadata JSON.
+    """
+    cols = _projection(columns)
+    sql = f"SELECT {_select(cols)} FROM images"
+    params: list = []
+    if after_id is not None:
+        sql += " WHERE id < ?"
+        params.append(after_id)
+    sql += " ORDER BY id DESC LIMIT ?"
+    params.append(limit)
+    with db.read(DB_PATH) as conn:
+        rows = conn.execute(sql, params).fetchall()
+    return [_row_to_dict(r, cols) for r in rows]
+
+
+def iter_images(page_size: int = 500, columns: Optional[Sequence[str]] = None) -> Iterator[Dict]:
+    """Yield every image, newest first, reading ``page_size`` rows at a time."""
+    after_id = None
+    while True:
+        page = list_images_page(after_id, page_size, columns)
+        yield from page
+        if len(page) < page_size:
+            return
+        after_id = page[-1]["id"]
 
 
 def get_image(image_id: int) -> Optional[Dict]:
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT id, path, title, description, tags, metadata FROM images WHERE id=?", (image_id,))
-    r = c.fetchone()
-    conn.close()
+    with db.read(DB_PATH) as conn:
+        r = conn.execute(f"SELECT {_COLUMNS} FROM images WHERE id=?", (image_id,)).fetchone()
     if not r:
         return None
-    return {
-        "id": r[0],
-        "path": r[1],
-        "title": r[2] or "",
-        "description": r[3] or "",
-        "tags": [t for t in (r[4] or "").split(",") if t],
-        "metadata": json.loads(r[5] or "{}"),
-    }
+    return _row_to_dict(r)
 
 
 def update_image(image_id: int, title: str = None, description: str = None, tags: Optional[List[str]] = None, metadata: Optional[Dict] = None):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    cur = c.execute("SELECT id, path, title, description, tags, metadata FROM images WHERE id=?", (image_id,))
-    row = cur.fetchone()
-    if not row:
-        conn.close()
+    # only the given fields are written, in a single UPDATE
+    fields = {}
+    if title is not None:
+        fields["title"] = title
+    if description is not None:
+        fields["description"] = description
+    if tags is not None:
+        fields["tags"] = ",".join(tags)
+    if metadata is not None:
+        fields.update(zip(METADATA_COLUMNS, _metadata_values(metadata)))
+    if not fields:
         return
-    path, old_title, old_description, old_tags, old_meta = row[1], row[2], row[3], row[4], row[5]
-    title = title if title is not None else old_title
-    description = description if description is not None else old_description
-    tags_s = ",".join(tags) if tags is not None else old_tags
-    meta_s = json.dumps(metadata) if metadata is not None else old_meta
-    c.execute("UPDATE images SET title=?, description=?, tags=?, metadata=? WHERE id=?", (title, description, tags_s, meta_s, image_id))
-    conn.commit()
-    conn.close()
+    assignments = ", ".join(f"{name}=?" for name in fields)
+    with db.write(DB_PATH) as conn:
+        cur = conn.execute(f"UPDATE images SET {assignments} WHERE id=?", (*fields.values(), image_id))
+        if tags is not None and cur.rowcount:
+            _write_tags(conn, image_id, tags)
+    if metadata is not None and cur.rowcount:
+        _notify(image_id, metadata)
+
+
+def images_with_tags(
+    all_of: Optional[List[str]] = None,
+    any_of: Optional[List[str]] = None,
+    after_id: Optional[int] = None,
+    limit: int = 200,
+    columns: Optional[Sequence[str]] = None,
+) -> List[Dict]:
+    """Return images carrying every tag in ``all_of`` and at least one in ``any_of``.
+
+    Tags match case-insensitively. Results are paged like list_images_page().
+    """
+    all_of = _normalize_tags(all_of)
+    any_of = _normalize_tags(any_of)
+    if not all_of and not any_of:
+        raise ValueError("all_of or any_of is required")
+    cols = _projection(columns)
+    where: List[str] = []
+    params: list = []
+    if all_of:
+        where.append(
+            f"id IN (SELECT image_id FROM image_tags WHERE tag IN ({', '.join('?' * len(all_of))})"
+            " GROUP BY image_id HAVING COUNT(*) = ?)"
+        )
+        params += all_of + [len(all_of)]
+    if any_of:
+        where.append(f"id IN (SELECT image_id FROM image_tags WHERE tag IN ({', '.join('?' * len(any_of))}))")
+        params += any_of
+    if after_id is not None:
+        where.append("id < ?")
+        params.append(after_id)
+    sql = f"SELECT {_select(cols)} FROM images WHERE {' AND '.join(where)} ORDER BY id DESC LIMIT ?"
+    params.append(limit)
+    with db.read(DB_PATH) as conn:
+        rows = conn.execute(sql, params).fetchall()
+    return [_row_to_dict(r, cols) for r in rows]
+
+
+def query_images(
+    min_width: Optional[int] = None,
+    max_width: Optional[int] = None,
+    min_height: Optional[int] = None,
+    max_height: Optional[int] = None,
+    orientation: Optional[str] = None,
+    near_color: Optional[Sequence[int]] = None,
+    max_color_distance: Optional[float] = None,
+    after_id: Optional[int] = None,
+    limit: int = 200,
+    columns: Optional[Sequence[str]] = None,
+) -> List[Dict]:
+    """Filter images on their size and average color in SQL.
+
+    ``orientation`` is "landscape", "portrait" or "square". With
+    ``near_color`` (an (r, g, b) triple) results are ordered by color distance,
+    closest first, and ``max_color_distance`` bounds it (the bound is applied
+    as an indexed box on avg_r/g/b first). Otherwise results are newest first
+    and paged with ``after_id`` like list_images_page().
+    """
+    cols = _projection(columns)
+    where: List[str] = []
+    params: list = []
+    for expr, value in (("width >= ?", min_width), ("width <= ?", max_width), ("height >= ?", min_height), ("height <= ?", max_height)):
+        if value is not None:
+            where.append(expr)
+            params.append(value)
+    if orientation is not None:
+        try:
+            where.append({"landscape": "width > height", "portrait": "width < height", "square": "width = height"}[orientation])
+        except KeyError:
+            raise ValueError(f"unknown orientation: {orientation}") from None
+    order = "id DESC"
+    if near_color is not None:
+        r, g, b = near_color
+        where.append("avg_r IS NOT NULL")
+        distance = "((avg_r - ?) * (avg_r - ?) + (avg_g - ?) * (avg_g - ?) + (avg_b - ?) * (avg_b - ?))"
+        if max_color_distance is not None:
+            d = max_color_distance
+            where.append("avg_r BETWEEN ? AND ? AND avg_g BETWEEN ? AND ? AND avg_b BETWEEN ? AND ?")
+            params += [r - d, r + d, g - d, g + d, b - d, b + d]
+            where.append(f"{distance} <= ?")
+            params += [r, r, g, g, b, b, d * d]
+        order = f"{distance}, id DESC"
+    elif after_id is not None:
+        where.append("id < ?")
+        params.append(after_id)
+    sql = f"SELECT {_select(cols)} FROM images"
+    if where:
+        sql += f" WHERE {' AND '.join(where)}"
+    sql += f" ORDER BY {order} LIMIT ?"
+    if near_color is not None:
+        params += [r, r, g, g, b, b]
+    params.append(limit)
+    with db.read(DB_PATH) as conn:
+        rows = conn.execute(sql, params).fetchall()
+    return [_row_to_dict(row, cols) for row in rows]
+
+
+def tag_counts(limit: Optional[int] = None) -> List[tuple]:
+    """Return ``(tag, image_count)`` pairs, most used first (tag facets)."""
+    sql = "SELECT tag, COUNT(*) AS n FROM image_tags GROUP BY tag ORDER BY n DESC, tag"
+    params: tuple = ()
+    if limit is not None:
+        sql += " LIMIT ?"
+        params = (limit,)
+    with db.read(DB_PATH) as conn:
+        return conn.execute(sql, params).fetchall()
+
+
+def search_images_local(query: str, limit: int = 20, match_all: bool = True, columns: Optional[Sequence[str]] = None) -> List[Dict]:
+    """Full-text search over titles, descriptions (including saved captions) and tags.
+
+    Words match by prefix and results are ranked best first (title matches
+    weigh most, then tags, then descriptions). With ``match_all`` every word
+    must appear; otherwise any word may, which suits matching a post topic
+    to the closest library photo.
+    """
+    words = re.findall(r"\w+", (query or "").lower())
+    if not words:
+        return []
+    cols = _projection(columns)
+    select = _select(cols, "images")
+    match = (" AND " if match_all else " OR ").join(f'"{w}"*' for w in words)
+    try:
+        with db.read(DB_PATH) as conn:
+            rows = conn.execute(
+                f"SELECT {select} FROM images_fts JOIN images ON images.id = images_fts.rowid"
+                " WHERE images_fts MATCH ? ORDER BY bm25(images_fts, 10.0, 2.0, 5.0) LIMIT ?",
+                (match, limit),
+            ).fetchall()
+    except sqlite3.OperationalError:
+        # no FTS5 support: unranked substring match
+        clauses = []
+        params: list = []
+        for w in words:
+            clauses.append("(title LIKE ? OR description LIKE ? OR tags LIKE ?)")
+            params += [f"%{w}%"] * 3
+        sql = f"SELECT {_select(cols)} FROM images WHERE {(' AND ' if match_all else ' OR ').join(clauses)} ORDER BY id DESC LIMIT ?"
+        with db.read(DB_PATH) as conn:
+            rows = conn.execute(sql, params + [limit]).fetchall()
+    return [_row_to_dict(r, cols) for r in rows]
@@ -1,11 +1,16 @@
 import os
 from PIL import Image, ImageDraw, ImageFont
-import requests
 from urllib.parse import quote_plus
-import json
 import os
 import time
 import hashlib
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Optional, Tuple
+
+import downloader
+import http_client
+import search_cache
 
 
 def generate_placeholder_image(text: str, out_path: str, size=(800, 450)):
@@ -23,12 +28,7 @@ def generate_placeholder_image(text: str, out_path: str, size=(800, 450)):
 
 
 def download_image(url: str, out_path: str):
-    r = requests.get(url, stream=True, timeout=10)
-    r.raise_for_status()
-    with open(out_path, "wb") as f:
-        for chunk in r.iter_content(1024):
-            f.write(chunk)
-    return out_path
+    return downloader.download_to(url, out_path)
 
 
 def is_valid_image_path(path: str) -> bool:
@@ -43,21 +43,43 @@ def is_valid_image_path(path: str) -> bool:
         return False
 
 
-def compute_image_metadata(path: str) -> dict:
-    """Return simple metadata: width, height, average_color (r,g,b)."""
+# longest side of the thumbnail every derived feature is computed from
+METADATA_THUMB_SIZE = 256
+
+
+def metadata_thumbnail(im: Image.Image, size: int = METADATA_THUMB_SIZE) -> Image.Image:
+    """Return a small RGB copy of ``im`` decoded at reduced resolution where possible.
+
+    JPEGs are scaled in the DCT domain by ``draft()``, so full-size pixels are
+    never produced; other formats are shrunk with ``reduce()`` before the
+    final resample (both through ``thumbnail(reducing_gap=...)``).
+    """
+    im.draft("RGB", (size, size))
+    if im.mode in ("P", "1"):
+        # palette images can only be resized with NEAREST; expand them first
+        im = im.convert("RGB")
+    im.thumbnail((size, size), Image.BILINEAR, reducing_gap=2.0)
+    return im if im.mode == "RGB" else im.convert("RGB")
+
+
+def compute_image_metadata(path: str, thumb_size: int = METADATA_THUMB_SIZE) -> dict:
+    """Return simple metadata: width, height, average_color (r,g,b) and phash.
+
+    Width and height come from the file header; the average color and phash
+    are computed from one shared thumbnail of at most ``thumb_size`` pixels.
+    """
     try:
         with Image.open(path) as im:
-            im = im.convert("RGB")
             w, h = im.size
-            # compute average color by resizing to 1x1
-            small = im.resize((1, 1))
-            avg = small.getpixel((0, 0))
+            thumb = metadata_thumbnail(im, thumb_size)
+            # mean of every pixel: what a 1x1 BOX resize gives
+            avg = thumb.resize((1, 1), Image.BOX).getpixel((0, 0))
             meta = {"width": w, "height": h, "avg_color": avg}
             # try to compute phash if imagehash is available
             try:
                 import imagehash
 
-                ph = imagehash.phash(im)
+                ph = imagehash.phash(thumb)
                 meta["phash"] = str(ph)
             except Exception:
                 meta["phash"] = None
@@ -81,6 +103,39 @@ def hamming_distance_hex(a: str, b: str) -> int:
         return 999
 
 
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    """Hex sha256 of a file's bytes, read in chunks so large files are never held in memory."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def phash_to_int(value) -> Optional[int]:
+    """Convert a 64-bit hex phash to the signed integer stored in SQLite INTEGER columns."""
+    if value is None or value == "":
+        return None
+    try:
+        v = value if isinstance(value, int) else int(str(value), 16)
+    except ValueError:
+        return None
+    v &= 0xFFFFFFFFFFFFFFFF
+    return v - (1 << 64) if v >= (1 << 63) else v
+
+
+def phash_to_hex(value: Optional[int]) -> Optional[str]:
+    """Inverse of phash_to_int(): the 16-digit hex string imagehash produces."""
+    if value is None:
+        return None
+    return format(value & 0xFFFFFFFFFFFFFFFF, "016x")
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Hamming distance between two 64-bit phash integers (signed or unsigned)."""
+    return bin((a ^ b) & 0xFFFFFFFFFFFFFFFF).count("1")
+
+
 def search_images_unsplash(query: str, max_results: int = 6) -> list:
     """Search Unsplash for the query. Requires UNSPLASH_ACCESS_KEY env var.
 
@@ -92,7 +147,7 @@ def search_images_unsplash(query: str, max_results: int = 6) -> list:
     try:
         url = f"https://api.unsplash.com/search/photos?query={quote_plus(query)}&per_page={max_results}"
         headers = {"Authorization": f"Client-ID {key}"}
-        r = requests.get(url, headers=headers, timeout=10)
+        r = http_client.get(url, headers=headers, timeout=10)
         r.raise_for_status()
         js = r.json()
         out = []
@@ -113,8 +168,7 @@ def search_images_duckduckgo(query: str, max_results: int = 6) -> list:
     out = []
     try:
         params = {"q": query}
-        headers = {"User-Agent": "SocialBot/1.0"}
-        r = requests.get("https://duckduckgo.com/i.js", params=params, headers=headers, timeout=10)
+        r = http_client.get("https://duckduckgo.com/i.js", params=params, timeout=10)
         r.raise_for_status()
         data = r.json()
         results = data.get("results", []) if isinstance(data, dict) else []
@@ -130,45 +184,109 @@ def search_images_duckduckgo(query: str, max_results: int = 6) -> list:
     return out
 
 
-def search_images(query: str, max_results: int = 6) -> list:
-    """Try Unsplash first, then fallback to DuckDuckGo."""
-    # simple file-based TTL cache to avoid repeating search API calls
-    try:
-        cache_dir = os.path.join(os.getcwd(), ".image_search_cache")
-        os.makedirs(cache_dir, exist_ok=True)
-        key = hashlib.sha256((query + str(max_results)).encode("utf-8")).hexdigest()
-        cache_file = os.path.join(cache_dir, key + ".json")
-        ttl = 60 * 60 * 12  # 12 hours
-        if os.path.exists(cache_file):
-            stat = os.path.getmtime(cache_file)
-            if time.time() - stat < ttl:
-                with open(cache_file, "r", encoding="utf-8") as f:
-                    try:
-                        return json.load(f)
-                    except Exception:
-                        pass
-    except Exception:
-        cache_file = None
+# seconds a search waits for providers in total; slower providers are left behind
+SEARCH_DEADLINE = 10.0
 
-    res = search_images_unsplash(query, max_results)
-    if not res:
-        res = search_images_duckduckgo(query, max_results)
+# name -> (search(query, max_results) -> list, priority); lower priority ranks first
+_providers: Dict[str, Tuple[Callable[[str, int], list], int]] = {}
+_providers_lock = threading.Lock()
+_search_executor: Optional[ThreadPoolExecutor] = None
 
-    try:
-        if cache_file and res:
-            with open(cache_file, "w", encoding="utf-8") as f:
-                json.dump(res, f)
-    except Exception:
-        pass
-    return res
+
+def register_provider(name: str, search: Callable[[str, int], list], priority: int = 100):
+    """Add (or replace) an image search provider queried by search_images()."""
+    with _providers_lock:
+        _providers[name] = (search, priority)
+
+
+def unregister_provider(name: str):
+    with _providers_lock:
+        _providers.pop(name, None)
+
+
+register_provider("unsplash", search_images_unsplash, priority=0)
+register_provider("duckduckgo", search_images_duckduckgo, priority=10)
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _search_executor
+    with _providers_lock:
+        if _search_executor is None:
+            _search_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="image-search")
+        return _search_executor
+
+
+def _merge(by_provider: Dict[str, Tuple[int, list]], max_results: int) -> list:
+    # provider priority, then each provider's own order; the same URL is listed once
+    out, seen = [], set()
+    for _, results in sorted(by_provider.values(), key=lambda x: x[0]):
+        for item in results:
+            url = item.get("url")
+            if url and url not in seen:
+                seen.add(url)
+                out.append(item)
+    return out[:max_results]
+
+
+def search_all_providers(
+    query: str,
+    max_results: int = 6,
+    deadline: Optional[float] = None,
+    min_results: Optional[int] = None,
+    on_results: Optional[Callable[[list], None]] = None,
+) -> list:
+    """Query every registered provider concurrently and merge their results.
+
+    Returns once ``min_results`` (default ``max_results``) merged results are
+    in, every provider has answered, or ``deadline`` seconds (default
+    SEARCH_DEADLINE) have passed, whichever comes first. ``on_results`` is
+    called with the merged list each time a provider answers.
+    """
+    with _providers_lock:
+        providers = dict(_providers)
+    if not providers:
+        return []
+    min_results = max_results if min_results is None else min_results
+    end = time.monotonic() + (SEARCH_DEADLINE if deadline is None else deadline)
+    pool = _executor()
+    pending = {pool.submit(fn, query, max_results): (name, priority) for name, (fn, priority) in providers.items()}
+    by_provider: Dict[str, Tuple[int, list]] = {}
+    merged: list = []
+    while pending:
+        done, _ = wait(pending, timeout=max(0, end - time.monotonic()), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for fut in done:
+            name, priority = pending.pop(fut)
+            try:
+                results = fut.result() or []
+            except Exception:
+                results = []
+            if results:
+                by_provider[name] = (priority, results)
+        merged = _merge(by_provider, max_results)
+        if on_results and done:
+            try:
+                on_results(merged)
+            except Exception:
+                pass
+        if len(merged) >= min_results:
+            break
+    for fut in pending:
+        # not started yet: drop; running ones finish in the background
+        fut.cancel()
+    return merged
+
+
+def search_images(query: str, max_results: int = 6) -> list:
+    """Search every registered provider at once (Unsplash ranked before DuckDuckGo).
+
+    Results are cached in search_cache (normalized query, LRU, served stale
+    while refreshing in the background).
+    """
+    return search_cache.get_or_fetch(query, max_results, search_all_providers)
 
 
 def download_image_to(path: str, url: str) -> str:
     """Download an image URL to a local path. Returns the path."""
-    r = requests.get(url, stream=True, timeout=15, headers={"User-Agent": "SocialBot/1.0"})
-    r.raise_for_status()
-    with open(path, "wb") as f:
-        for chunk in r.iter_content(8192):
-            if chunk:
-                f.write(chunk)
-    return path
+    return downloader.download_to(url, path)
@@ -0,0 +1,198 @@
+"""Bulk import of a folder tree into the image library.
+
+Metadata (decode, average color, phash) is computed in a process pool sized
+to the machine's cores, and rows are written with image_db.add_images() in
+batched transactions. Files already in the library with unchanged size and
+mtime are skipped after a stat call, and files whose bytes are already
+imported under another path are not decoded, so an interrupted import picks
+up where it stopped when run again.
+
+    python ingest.py path/to/catalog --workers 8 --batch-size 200
+    python ingest.py --refresh        # re-scan library files changed on disk
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+import image_db
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp")
+
+
+def iter_image_files(root: str, recursive: bool = True) -> Iterator[str]:
+    """Yield absolute paths of image files under ``root``, in a stable order."""
+    root = os.path.abspath(root)
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        if not recursive:
+            dirnames.clear()
+        for name in sorted(filenames):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(dirpath, name)
+
+
+# content hashes already in the library, set once per worker process
+_known_hashes: set = set()
+
+
+def _init_worker(known_hashes: set):
+    global _known_hashes
+    _known_hashes = known_hashes
+
+
+def _analyse(job):
+    # runs in a worker process: hash the bytes first, decode only files not already in the library
+    from image_utils import compute_image_metadata, file_sha256
+
+    path, dedup = job
+    try:
+        content_hash = file_sha256(path)
+    except OSError:
+        return path, None, None
+    if dedup and content_hash in _known_hashes:
+        return path, content_hash, None
+    return path, content_hash, compute_image_metadata(path)
+
+
+def ingest_files(
+    paths: Sequence[str],
+    workers: Optional[int] = None,
+    batch_size: int = 200,
+    tags: Optional[List[str]] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, int]:
+    """Add new files among ``paths`` and refresh the ones that changed on disk.
+
+    Files already in the library with the size and mtime recorded at their
+    last scan cost one stat call. New files are hashed and, unless the same
+    bytes are already in the library, decoded for metadata; known files whose
+    size or mtime changed get their hash and metadata recomputed.
+
+    Returns counts: added, refreshed, skipped (unchanged), duplicates (same
+    bytes already imported), failed (unreadable) and missing (cannot stat).
+    ``workers`` defaults to the number of cores; 0 analyses in this process.
+    ``progress(done, total)`` is called after every batch.
+    """
+    image_db.init_db()
+    known = image_db.file_states()
+    stats = {"added": 0, "refreshed": 0, "skipped": 0, "duplicates": 0, "failed": 0, "missing": 0}
+    jobs = []
+    states = {}
+    for path in dict.fromkeys(paths):
+        state = image_db.file_state(path)
+        if state is None:
+            stats["missing"] += 1
+            continue
+        row = known.get(path)
+        if row is not None and (row[1], row[2]) == state:
+            stats["skipped"] += 1
+            continue
+        states[path] = state
+        jobs.append((path, row is None))
+    total = len(jobs)
+    if not total:
+        if progress:
+            progress(0, 0)
+        return stats
+
+    hashes = image_db.known_hashes()
+    done = 0
+    added: List[Dict] = []
+    refreshed: List[Dict] = []
+
+    def flush():
+        if added:
+            image_db.add_images(added)
+            stats["added"] += len(added)
+            added.clear()
+        if refreshed:
+            image_db.update_files(refreshed)
+            stats["refreshed"] += len(refreshed)
+            refreshed.clear()
+        if progress:
+            progress(done, total)
+
+    def consume(results):
+        nonlocal done
+        for path, content_hash, meta in results:
+            done += 1
+            row = known.get(path)
+            if content_hash is None:
+                stats["failed"] += 1
+            elif row is None and content_hash in hashes:
+                stats["duplicates"] += 1
+            elif not meta or meta.get("width") is None:
+                # not a readable image
+                stats["failed"] += 1
+            else:
+                size, mtime = states[path]
+                info = {"metadata": meta, "content_hash": content_hash, "file_size": size, "file_mtime": mtime}
+                if row is None:
+                    hashes.add(content_hash)
+                    title = os.path.splitext(os.path.basename(path))[0]
+                    added.append(dict(info, path=path, title=title, tags=tags))
+                else:
+                    refreshed.append(dict(info, id=row[0]))
+            if done % batch_size == 0:
+                flush()
+        flush()
+
+    if workers == 0:
+        _init_worker(hashes)
+        consume(map(_analyse, jobs))
+    else:
+        workers = workers or os.cpu_count() or 1
+        # spawn, not fork: this runs from a thread of the Tk app, which has other threads and open SQLite connections
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker, initargs=(set(hashes),)) as pool:
+            chunksize = max(1, min(32, total // (workers * 4)))
+            consume(pool.map(_analyse, jobs, chunksize=chunksize))
+    return stats
+
+
+def refresh_library(**kwargs) -> Dict[str, int]:
+    """Recompute metadata for library files whose size or mtime changed; see ingest_files()."""
+    image_db.init_db()
+    return ingest_files(list(image_db.file_states()), **kwargs)
+
+
+def ingest_directory(root: str, recursive: bool = True, **kwargs) -> Dict[str, int]:
+    """Import every image file under ``root``; see ingest_files() for the options."""
+    return ingest_files(list(iter_image_files(root, recursive)), **kwargs)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Import a folder of images into the image library")
+    ap.add_argument("root", nargs="?")
+    ap.add_argument("--refresh", action="store_true", help="recompute metadata of library files changed on disk")
+    ap.add_argument("--workers", type=int, default=None, help="metadata processes (default: cores)")
+    ap.add_argument("--batch-size", type=int, default=200, help="rows per transaction")
+    ap.add_argument("--no-recursive", action="store_true")
+    ap.add_argument("--tags", default="", help="comma separated tags for every imported image")
+    args = ap.parse_args(argv)
+
+    def progress(done, total):
+        sys.stdout.write(f"\r{done}/{total} analysed")
+        sys.stdout.flush()
+
+    if args.refresh:
+        stats = refresh_library(workers=args.workers, batch_size=args.batch_size, progress=progress)
+    elif args.root:
+        stats = ingest_directory(
+            args.root,
+            recursive=not args.no_recursive,
+            workers=args.workers,
+            batch_size=args.batch_size,
+            tags=[t.strip() for t in args.tags.split(",") if t.strip()],
+            progress=progress,
+        )
+    else:
+        ap.error("a folder or --refresh is required")
+    print("\n" + ", ".join(f"{name} {n}" for name, n in stats.items()))
+
+
+if __name__ == "__main__":
+    main()
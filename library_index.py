@@ -0,0 +1,106 @@
+"""Shared plumbing for the in-memory indexes over the image library.
+
+A LibraryIndex is loaded from one image database on first use and then kept
+current through image_db.subscribe(). Subclasses only say how to read their
+values from the database and from a metadata dict, and how to store one:
+
+    _load(conn)        -> [(image_id, value), ...] for every image
+    _value(metadata)   -> value for one image from its metadata dict
+    _reset(n)          clear the structures before a build of n rows
+    _put(image_id, value)
+
+All four run with the index lock held (``_load`` excepted). ``shared(cls)``
+returns the one subscribed instance of ``cls`` for the current
+image_db.DB_PATH.
+"""
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple, Type, TypeVar
+
+import db
+import image_db
+
+T = TypeVar("T", bound="LibraryIndex")
+
+
+class LibraryIndex:
+    """Base class for an index over one image database, kept in sync with it."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or image_db.DB_PATH
+        self._lock = threading.Lock()
+        self._built = False
+        # changes seen while build() is reading the database, replayed on top of it
+        self._changes: Optional[Dict[int, Any]] = None
+
+    def _load(self, conn) -> Iterable[Tuple[int, Any]]:
+        raise NotImplementedError
+
+    def _value(self, metadata: Optional[Dict]) -> Any:
+        raise NotImplementedError
+
+    def _reset(self, n: int):
+        raise NotImplementedError
+
+    def _put(self, image_id: int, value: Any):
+        raise NotImplementedError
+
+    def build(self):
+        """(Re)load every image from the database."""
+        with self._lock:
+            self._changes = {}
+        with db.read(self.path) as conn:
+            rows = list(self._load(conn))
+        with self._lock:
+            self._reset(len(rows))
+            for image_id, value in rows:
+                self._put(image_id, value)
+            for image_id, value in self._changes.items():
+                self._put(image_id, value)
+            self._changes = None
+            self._built = True
+
+    def ensure_built(self):
+        if not self._built:
+            self.build()
+
+    def upsert(self, image_id: int, metadata: Optional[Dict]):
+        """Add or replace one image."""
+        with self._lock:
+            self._put(image_id, self._value(metadata))
+
+    def _on_change(self, image_id: int, metadata: Dict):
+        # subscriptions are per process; ignore writes to another database file
+        if image_db.DB_PATH != self.path:
+            return
+        value = self._value(metadata)
+        with self._lock:
+            if self._changes is not None:
+                self._changes[image_id] = value
+            if self._built:
+                self._put(image_id, value)
+
+
+_indexes: Dict[Tuple[type, str], LibraryIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def shared(cls: Type[T]) -> T:
+    """Return the shared ``cls`` index for the current image_db.DB_PATH, subscribed to its changes.
+
+    The index is loaded lazily on its first query.
+    """
+    key = (cls, image_db.DB_PATH)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = cls(key[1])
+            image_db.subscribe(index._on_change)
+        return index
+
+
+def reset():
+    """Unsubscribe and forget every shared index (tests, or after swapping DB_PATH)."""
+    with _indexes_lock:
+        for index in _indexes.values():
+            image_db.unsubscribe(index._on_change)
+        _indexes.clear()
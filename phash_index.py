@@ -0,0 +1,130 @@
+"""Near-duplicate lookup over the perceptual hashes of the image library.
+
+Hashes are 64-bit integers (the ``images.phash`` column). They are held in a
+BK-tree keyed by Hamming distance, so "every image within distance d" only
+visits the subtrees the triangle inequality allows instead of comparing
+against the whole library. The tree is loaded from image_db once and kept
+current through image_db.subscribe().
+"""
+from typing import Dict, List, Optional, Set, Tuple
+
+import library_index
+from image_utils import hamming_distance, phash_to_int
+from library_index import LibraryIndex
+
+# images whose phashes differ in at most this many of 64 bits are reported as duplicates
+DUPLICATE_DISTANCE = 6
+
+
+class _Node:
+    __slots__ = ("phash", "ids", "children")
+
+    def __init__(self, phash: int):
+        self.phash = phash
+        self.ids: Set[int] = set()
+        # distance to this node -> child
+        self.children: Dict[int, "_Node"] = {}
+
+
+class BKTree:
+    """BK-tree of 64-bit hashes; each distinct hash keeps the set of image ids carrying it."""
+
+    def __init__(self):
+        self._root: Optional[_Node] = None
+        self._nodes: Dict[int, _Node] = {}
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def add(self, phash: int, image_id: int):
+        node = self._nodes.get(phash)
+        if node is None:
+            node = self._nodes[phash] = _Node(phash)
+            if self._root is None:
+                self._root = node
+            else:
+                parent = self._root
+                while True:
+                    d = hamming_distance(phash, parent.phash)
+                    child = parent.children.get(d)
+                    if child is None:
+                        parent.children[d] = node
+                        break
+                    parent = child
+        node.ids.add(image_id)
+
+    def discard(self, phash: int, image_id: int):
+        # the node stays in the tree as a signpost; only its id set shrinks
+        node = self._nodes.get(phash)
+        if node is not None:
+            node.ids.discard(image_id)
+
+    def within(self, phash: int, max_distance: int) -> List[Tuple[int, int]]:
+        """Return ``(image_id, distance)`` for every id within ``max_distance``, closest first."""
+        out: List[Tuple[int, int]] = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            d = hamming_distance(phash, node.phash)
+            if d <= max_distance:
+                out.extend((image_id, d) for image_id in node.ids)
+            lo, hi = d - max_distance, d + max_distance
+            for cd, child in node.children.items():
+                if lo <= cd <= hi:
+                    stack.append(child)
+        out.sort(key=lambda x: (x[1], x[0]))
+        return out
+
+
+class PhashIndex(LibraryIndex):
+    """BK-tree over one image database, kept in sync with it."""
+
+    def __init__(self, path: Optional[str] = None):
+        super().__init__(path)
+        self._tree = BKTree()
+        self._by_id: Dict[int, int] = {}
+
+    def _load(self, conn):
+        return conn.execute("SELECT id, phash FROM images WHERE phash IS NOT NULL").fetchall()
+
+    def _value(self, metadata):
+        return phash_to_int((metadata or {}).get("phash"))
+
+    def _reset(self, n: int):
+        self._tree = BKTree()
+        self._by_id = {}
+
+    def _put(self, image_id: int, phash: Optional[int]):
+        old = self._by_id.pop(image_id, None)
+        if old is not None:
+            self._tree.discard(old, image_id)
+        if phash is not None:
+            self._by_id[image_id] = phash
+            self._tree.add(phash, image_id)
+
+    def within(self, phash, max_distance: int = DUPLICATE_DISTANCE, exclude: Optional[int] = None) -> List[Tuple[int, int]]:
+        """``(image_id, distance)`` pairs within ``max_distance`` of ``phash`` (hex string or int)."""
+        phash = phash_to_int(phash)
+        if phash is None:
+            return []
+        self.ensure_built()
+        with self._lock:
+            matches = self._tree.within(phash, max_distance)
+        return [m for m in matches if m[0] != exclude]
+
+
+def get_index() -> PhashIndex:
+    """Return the shared index for the current image_db.DB_PATH (see library_index.shared)."""
+    return library_index.shared(PhashIndex)
+
+
+def find_near_duplicates(phash, max_distance: int = DUPLICATE_DISTANCE, exclude: Optional[int] = None) -> List[Tuple[int, int]]:
+    """Library images whose phash is within ``max_distance`` bits of ``phash``, closest first."""
+    return get_index().within(phash, max_distance, exclude)
+
+
+def find_duplicates_of_file(path: str, max_distance: int = DUPLICATE_DISTANCE) -> List[Tuple[int, int]]:
+    """Hash the image at ``path`` and return near-duplicates already in the library."""
+    from image_utils import compute_image_metadata
+
+    return find_near_duplicates(compute_image_metadata(path).get("phash"), max_distance)
@@ -0,0 +1,198 @@
+"""Concurrent publishing of scheduled posts.
+
+PublishPool runs connector ``post()`` calls on a bounded thread pool. Each
+connector has its own concurrency cap and optional rate limit, so a large
+backlog drains in parallel without exceeding what a platform accepts.
+Outcomes are collected by a reporter thread and written back to storage in
+batches instead of one transaction per post. While a post is being published
+a heartbeat thread keeps its storage lease alive, so no other process
+reclaims it.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import storage
+
+# per-connector caps: concurrent posts in flight, and posts per second (None: unlimited)
+CONNECTOR_LIMITS = {
+    "Stub": {"concurrency": 8, "rate": None},
+    "Facebook": {"concurrency": 4, "rate": 5.0},
+}
+DEFAULT_LIMITS = {"concurrency": 4, "rate": None}
+
+
+class RateLimiter:
+    """Token bucket allowing ``rate`` acquisitions per second with bursts of ``burst``."""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1, int(rate)))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class _ConnectorSlot:
+    def __init__(self, factory: Callable[[], Any], concurrency: int, rate: Optional[float], burst: Optional[int] = None):
+        self.factory = factory
+        self.instance = None
+        self.semaphore = threading.BoundedSemaphore(concurrency)
+        self.limiter = RateLimiter(rate, burst) if rate else None
+        self.lock = threading.Lock()
+
+    def connector(self):
+        with self.lock:
+            if self.instance is None:
+                self.instance = self.factory()
+            return self.instance
+
+
+class PublishPool:
+    """Publish claimed ``scheduled`` rows concurrently and report outcomes in batches.
+
+    ``connectors`` maps a connector name to a zero-argument factory; instances
+    are built once and reused until reset_connectors() is called (e.g. after
+    credentials change). ``limits`` overrides CONNECTOR_LIMITS per name.
+    """
+
+    def __init__(
+        self,
+        connectors: Dict[str, Callable[[], Any]],
+        default_connector: Optional[str] = None,
+        max_workers: int = 8,
+        limits: Optional[Dict[str, Dict[str, Any]]] = None,
+        report_batch: int = 50,
+        report_interval: float = 0.5,
+        retry_delay: int = 30,
+        lease_seconds: int = storage.DEFAULT_LEASE_SECONDS,
+    ):
+        if not connectors:
+            raise ValueError("at least one connector is required")
+        limits = limits or {}
+        self._slots: Dict[str, _ConnectorSlot] = {}
+        for name, factory in connectors.items():
+            cfg = dict(DEFAULT_LIMITS)
+            cfg.update(CONNECTOR_LIMITS.get(name, {}))
+            cfg.update(limits.get(name, {}))
+            self._slots[name] = _ConnectorSlot(factory, cfg["concurrency"], cfg["rate"], cfg.get("burst"))
+        self.default_connector = default_connector or next(iter(connectors))
+        self.report_batch = report_batch
+        self.report_interval = report_interval
+        self.retry_delay = retry_delay
+        self.lease_seconds = lease_seconds
+        # post id -> lease owner, from submit() until the outcome is stored
+        self._inflight: Dict[int, Optional[str]] = {}
+        self._inflight_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="publish")
+        # bounds queued-but-not-started work so the caller feels backpressure
+        self._capacity = threading.BoundedSemaphore(max_workers * 2)
+        self._results: "queue.Queue" = queue.Queue()
+        self._reporter = threading.Thread(target=self._report_loop, daemon=True)
+        self._reporter.start()
+        self._heartbeat = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        self._heartbeat.start()
+
+    def reset_connectors(self, *args):
+        """Drop cached connector instances so the next post builds fresh ones."""
+        for slot in self._slots.values():
+            with slot.lock:
+                slot.instance = None
+
+    def submit(self, row: Dict[str, Any], connector: Optional[str] = None) -> Future:
+        """Queue ``row`` for publishing. Blocks while the pool is saturated."""
+        slot = self._slots[connector or self.default_connector]
+        self._capacity.acquire()
+        with self._inflight_lock:
+            self._inflight[row["id"]] = row.get("lease_owner")
+        try:
+            return self._executor.submit(self._publish, slot, row)
+        except Exception:
+            self._capacity.release()
+            raise
+
+    def _publish(self, slot: _ConnectorSlot, row: Dict[str, Any]):
+        try:
+            with slot.semaphore:
+                if slot.limiter:
+                    slot.limiter.acquire()
+                res = slot.connector().post(row["content"])
+            self._results.put((row["id"], row.get("lease_owner"), True))
+            return res
+        except Exception:
+            self._results.put((row["id"], row.get("lease_owner"), False))
+            raise
+        finally:
+            self._capacity.release()
+
+    def _by_owner(self, items) -> Dict[Optional[str], List[tuple]]:
+        groups: Dict[Optional[str], List[tuple]] = {}
+        for item in items:
+            groups.setdefault(item[1], []).append(item)
+        return groups
+
+    def _flush(self, batch: List[tuple]):
+        retry_at = int(time.time()) + self.retry_delay
+        for owner, items in self._by_owner(batch).items():
+            sent = [pid for pid, _, ok in items if ok]
+            failed = [pid for pid, _, ok in items if not ok]
+            try:
+                storage.record_publish_results(sent, failed, retry_at=retry_at, owner=owner)
+            except Exception:
+                # unreported posts stay in_flight and are reclaimed when their lease expires
+                pass
+        with self._inflight_lock:
+            for pid, _, _ in batch:
+                self._inflight.pop(pid, None)
+
+    def _heartbeat_loop(self):
+        while not self._stopped.wait(self.lease_seconds / 3.0):
+            with self._inflight_lock:
+                inflight = list(self._inflight.items())
+            for owner, items in self._by_owner([(pid, owner) for pid, owner in inflight]).items():
+                try:
+                    storage.renew_leases([pid for pid, _ in items], owner, self.lease_seconds)
+                except Exception:
+                    pass
+
+    def _report_loop(self):
+        while True:
+            # block for the first outcome, then gather more for up to report_interval
+            item = self._results.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.report_interval
+            while len(batch) < self.report_batch:
+                try:
+                    item = self._results.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._flush(batch)
+                    return
+                batch.append(item)
+            self._flush(batch)
+
+    def shutdown(self, wait: bool = True):
+        """Finish queued posts, report every outcome and stop the pool."""
+        self._executor.shutdown(wait=wait)
+        self._results.put(None)
+        if wait:
+            self._reporter.join()
+        self._stopped.set()
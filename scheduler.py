@@ -1,28 +1,254 @@
+import heapq
+import itertools
+import os
+import socket
 import threading
 import time
-from typing import Callable
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, List, Optional
+
+import storage
+
+
+class Job:
+    """Handle for a job queued on a Scheduler.
+
+    Jobs use slots and sit directly in the scheduler's heap, so a pending job
+    costs one small object regardless of how many are queued.
+    """
+
+    __slots__ = ("due", "seq", "fn", "args", "cancelled", "started", "done", "_scheduler")
+
+    def __init__(self, scheduler, due: float, seq: int, fn: Callable, args: tuple):
+        self._scheduler = scheduler
+        self.due = due
+        self.seq = seq
+        self.fn = fn
+        self.args = args
+        self.cancelled = False
+        self.started = False
+        self.done = False
+
+    def __lt__(self, other: "Job") -> bool:
+        return (self.due, self.seq) < (other.due, other.seq)
+
+    def cancel(self) -> bool:
+        """Cancel the job if it has not started yet. Returns True if it was cancelled."""
+        return self._scheduler.cancel(self)
 
 
 class Scheduler:
     """Very small scheduler that runs a posting function after a delay.
 
+    Pending jobs are kept in a heap ordered by due time. One dispatcher thread
+    sleeps until the earliest job is due and hands it to a bounded worker pool,
+    so thousands of queued posts do not mean thousands of sleeping threads.
+
     This scheduler only demonstrates local delayed execution. Connectors should
     implement actual publishing using platform APIs.
     """
 
-    def __init__(self):
-        self.jobs = []
-
-    def schedule_post(self, content: str, delay_seconds: int = 0, on_post: Callable[[str], None] = None):
-        def job():
-            if delay_seconds:
-                time.sleep(delay_seconds)
-            # call provided callback (if any) or print to console
-            if on_post:
-                on_post(content)
-            else:
-                print(f"[Scheduled post executed] {content}")
-
-        t = threading.Thread(target=job, daemon=True)
-        t.start()
-        self.jobs.append(t)
+    def __init__(self, max_workers: int = 4):
+        self._heap: List[Job] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._cancelled = 0
+        self._shutdown = False
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scheduler")
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def schedule(self, delay_seconds: float, fn: Callable, *args) -> Job:
+        """Run ``fn(*args)`` on the worker pool after ``delay_seconds``."""
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("scheduler is shut down")
+            job = Job(self, time.monotonic() + max(0, delay_seconds or 0), next(self._seq), fn, args)
+            heapq.heappush(self._heap, job)
+            # only the dispatcher's sleep target changes when the new job is first in line
+            if self._heap[0] is job:
+                self._cond.notify()
+        return job
+
+    def schedule_post(self, content: str, delay_seconds: int = 0, on_post: Callable[[str], None] = None) -> Job:
+        return self.schedule(delay_seconds, self._post, content, on_post)
+
+    @staticmethod
+    def _post(content: str, on_post: Callable[[str], None] = None):
+        # call provided callback (if any) or print to console
+        if on_post:
+            on_post(content)
+        else:
+            print(f"[Scheduled post executed] {content}")
+
+    def cancel(self, job: Job) -> bool:
+        with self._cond:
+            if job.cancelled or job.started:
+                return False
+            job.cancelled = True
+            self._cancelled += 1
+            # cancelled jobs are dropped lazily; compact once they are half the heap
+            if self._cancelled > len(self._heap) // 2:
+                self._heap = [j for j in self._heap if not j.cancelled]
+                heapq.heapify(self._heap)
+                self._cancelled = 0
+            return True
+
+    def pending(self) -> int:
+        """Number of jobs queued and not yet started or cancelled."""
+        with self._cond:
+            return len(self._heap) - self._cancelled
+
+    def shutdown(self, wait: bool = True):
+        """Stop dispatching; jobs not yet due are dropped."""
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify()
+        self._thread.join()
+        self._executor.shutdown(wait=wait)
+
+    def _execute(self, job: Job):
+        try:
+            job.fn(*job.args)
+        finally:
+            job.done = True
+
+    def _execute_logged(self, job: Job):
+        try:
+            self._execute(job)
+        except Exception:
+            traceback.print_exc()
+
+    def _pop_due(self) -> List[Job]:
+        """Wait until at least one job is due and pop every job that is."""
+        with self._cond:
+            while True:
+                if self._shutdown:
+                    return []
+                now = time.monotonic()
+                due = []
+                while self._heap and (self._heap[0].cancelled or self._heap[0].due <= now):
+                    job = heapq.heappop(self._heap)
+                    if job.cancelled:
+                        self._cancelled -= 1
+                        continue
+                    # marked under the lock so cancel() can no longer succeed
+                    job.started = True
+                    due.append(job)
+                if due:
+                    return due
+                self._cond.wait(self._heap[0].due - now if self._heap else None)
+
+    def _run(self):
+        while True:
+            due = self._pop_due()
+            if not due:
+                return
+            # one pool task per job so a slow job never holds up the others
+            for job in due:
+                self._executor.submit(self._execute_logged, job)
+
+
+def make_owner_id() -> str:
+    """Return a lease owner id unique to this dispatcher across hosts and processes."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class ScheduledPostDispatcher:
+    """Publishes posts from the storage ``scheduled`` table as they fall due.
+
+    A single thread sleeps until the next ``run_at`` reported by
+    ``storage.next_due_time()``, or indefinitely when nothing is queued. Queuing
+    a post through storage wakes it early, so a post added for "now" goes out
+    immediately instead of waiting for the next poll.
+
+    Claimed rows are handed to ``pool`` (a publisher.PublishPool), which posts
+    them concurrently and reports outcomes to storage. Without a pool,
+    ``publish(row)`` is called inline for every row; when it raises, the post
+    is returned to the queue and retried after ``retry_delay`` seconds.
+
+    Claims are leased to ``owner``, so several processes can run a dispatcher
+    against the same database without publishing a post twice. Other
+    processes do not wake this one, so with ``max_sleep`` set it re-checks the
+    queue at least that often to pick up their posts and expired leases.
+    """
+
+    def __init__(
+        self,
+        publish: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        batch_size: int = 50,
+        retry_delay: int = 30,
+        pool=None,
+        owner: Optional[str] = None,
+        max_sleep: Optional[float] = None,
+    ):
+        if publish is None and pool is None:
+            raise ValueError("publish or pool is required")
+        self.publish = publish
+        self.pool = pool
+        self.batch_size = batch_size
+        self.retry_delay = retry_delay
+        self.owner = owner or make_owner_id()
+        self.max_sleep = max_sleep
+        # number of times the loop woke up and looked at the queue
+        self.wakeups = 0
+        self._cond = threading.Condition()
+        self._woken = False
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        storage.subscribe_scheduled(self.wake)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        storage.unsubscribe_scheduled(self.wake)
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def wake(self, run_at: Optional[int] = None):
+        """Make the loop re-read the next due time (called by storage on every insert)."""
+        with self._cond:
+            self._woken = True
+            self._cond.notify_all()
+
+    def _dispatch(self, row: Dict[str, Any]):
+        if self.pool is not None:
+            self.pool.submit(row)
+            return
+        try:
+            self.publish(row)
+            storage.record_publish_results([row["id"]], owner=self.owner)
+        except Exception:
+            storage.release_scheduled_post(row["id"], retry_at=int(time.time()) + self.retry_delay, owner=self.owner)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                # cleared before reading the queue so an insert made after the read still wakes us
+                self._woken = False
+            self.wakeups += 1
+            try:
+                next_at = storage.next_due_time()
+                now = time.time()
+                if next_at is not None and next_at <= now:
+                    for row in storage.claim_due_posts(int(now), limit=self.batch_size, owner=self.owner):
+                        self._dispatch(row)
+                    continue
+                timeout = None if next_at is None else next_at - now
+                if self.max_sleep is not None:
+                    timeout = self.max_sleep if timeout is None else min(timeout, self.max_sleep)
+            except Exception:
+                # storage unavailable (e.g. locked or not initialized yet): try again later
+                timeout = self.retry_delay
+            with self._cond:
+                if not self._woken and not self._stopped:
+                    self._cond.wait(timeout)
@@ -0,0 +1,130 @@
+"""Micro-benchmark image_db on a large library.
+
+Compares the old access pattern (connect per call, update_image doing a
+SELECT then an UPDATE, metadata as one JSON blob filtered in Python) against
+the pooled, statement-cached connections in db.py and the typed metadata
+columns. Runs against temporary databases.
+
+    python scripts/bench_image_db.py --rows 10000 --ops 2000
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+
+import db
+import image_db
+
+LEGACY_PATH = None
+
+
+def _legacy_row(r):
+    return {
+        "id": r[0],
+        "path": r[1],
+        "title": r[2] or "",
+        "description": r[3] or "",
+        "tags": [t for t in (r[4] or "").split(",") if t],
+        "metadata": json.loads(r[5] or "{}"),
+    }
+
+
+def legacy_get_image(image_id):
+    conn = sqlite3.connect(LEGACY_PATH)
+    r = conn.execute("SELECT id, path, title, description, tags, metadata FROM images WHERE id=?", (image_id,)).fetchone()
+    conn.close()
+    return _legacy_row(r) if r else None
+
+
+def legacy_list_images():
+    conn = sqlite3.connect(LEGACY_PATH)
+    rows = conn.execute("SELECT id, path, title, description, tags, metadata FROM images ORDER BY id DESC").fetchall()
+    conn.close()
+    return [_legacy_row(r) for r in rows]
+
+
+def legacy_wide_landscapes():
+    return [
+        img for img in legacy_list_images()
+        if (img["metadata"].get("width") or 0) > 1200 and img["metadata"]["width"] > (img["metadata"].get("height") or 0)
+    ][:200]
+
+
+def legacy_update_image(image_id, description=None):
+    conn = sqlite3.connect(LEGACY_PATH)
+    row = conn.execute("SELECT id, path, title, description, tags, metadata FROM images WHERE id=?", (image_id,)).fetchone()
+    if not row:
+        conn.close()
+        return
+    conn.execute(
+        "UPDATE images SET title=?, description=?, tags=?, metadata=? WHERE id=?",
+        (row[2], description if description is not None else row[3], row[4], row[5], image_id),
+    )
+    conn.commit()
+    conn.close()
+
+
+def timed(fn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return time.perf_counter() - start
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=10000)
+    ap.add_argument("--ops", type=int, default=2000, help="get/update calls per run")
+    ap.add_argument("--lists", type=int, default=5, help="list_images calls per run")
+    args = ap.parse_args()
+
+    global LEGACY_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        rng = random.Random(0)
+        metas = [
+            {"width": rng.randrange(400, 4000), "height": rng.randrange(400, 4000), "avg_color": [120, 110, 90], "phash": "f0e1d2c3b4a59687"}
+            for _ in range(args.rows)
+        ]
+        # legacy: the original schema, metadata as a JSON blob
+        LEGACY_PATH = os.path.join(tmp, "legacy.sqlite3")
+        conn = sqlite3.connect(LEGACY_PATH)
+        conn.execute("CREATE TABLE images (id INTEGER PRIMARY KEY AUTOINCREMENT, path TEXT NOT NULL, title TEXT, description TEXT, tags TEXT, metadata TEXT)")
+        conn.executemany(
+            "INSERT INTO images (path, title, description, tags, metadata) VALUES (?, ?, ?, ?, ?)",
+            [(f"/photos/{i}.jpg", f"Photo {i}", "", "product,catalog", json.dumps(m)) for i, m in enumerate(metas)],
+        )
+        conn.commit()
+        conn.close()
+
+        image_db.DB_PATH = os.path.join(tmp, "images.sqlite3")
+        image_db.init_db()
+        image_db.add_images(
+            [{"path": f"/photos/{i}.jpg", "title": f"Photo {i}", "tags": ["product", "catalog"], "metadata": m} for i, m in enumerate(metas)]
+        )
+        ids = lambda: random.randint(1, args.rows)
+
+        cases = (
+            ("get_image", lambda: legacy_get_image(ids()), lambda: image_db.get_image(ids()), args.ops),
+            ("update_image", lambda: legacy_update_image(ids(), "x"), lambda: image_db.update_image(ids(), description="y"), args.ops),
+            ("list_images", legacy_list_images, image_db.list_images, args.lists),
+            ("wide_landscape", legacy_wide_landscapes, lambda: image_db.query_images(min_width=1201, orientation="landscape"), args.lists),
+        )
+        for name, before, after, n in cases:
+            t_before = timed(before, n)
+            t_after = timed(after, n)
+            print(
+                f"{name:<13} {n:>6} calls  before {n / t_before:9.0f}/s  after {n / t_after:9.0f}/s  ({t_before / t_after:.1f}x)"
+            )
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Benchmark image_utils.compute_image_metadata on large photos.
+
+Compares the old full-resolution decode (convert the whole image to RGB, then
+derive avg color and phash from it) against the reduced-resolution path
+(header size, draft()/reduce() thumbnail shared by every feature). Each mode
+runs in its own subprocess so its peak RSS can be reported.
+
+    python scripts/bench_metadata.py --count 5 --width 6000 --height 4000
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+
+from PIL import Image
+
+import image_utils
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS
+    resource = None
+
+
+def legacy_compute_image_metadata(path):
+    with Image.open(path) as im:
+        im = im.convert("RGB")
+        w, h = im.size
+        avg = im.resize((1, 1)).getpixel((0, 0))
+        meta = {"width": w, "height": h, "avg_color": avg}
+        try:
+            import imagehash
+
+            meta["phash"] = str(imagehash.phash(im))
+        except Exception:
+            meta["phash"] = None
+        return meta
+
+
+def make_photos(folder, count, size):
+    paths = []
+    for i in range(count):
+        noise = Image.effect_noise(size, 40 + i)
+        photo = Image.merge("RGB", (noise, noise.point(lambda v: v // 2), noise.point(lambda v: 255 - v)))
+        path = os.path.join(folder, f"photo{i}.jpg")
+        photo.save(path, quality=90)
+        paths.append(path)
+    return paths
+
+
+def worker(mode, paths):
+    fn = legacy_compute_image_metadata if mode == "legacy" else image_utils.compute_image_metadata
+    # import imagehash/scipy before timing
+    fn(paths[0])
+    start = time.perf_counter()
+    for p in paths:
+        fn(p)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is KiB on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else 0
+    print(f"{elapsed / len(paths)} {peak}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--count", type=int, default=5)
+    ap.add_argument("--width", type=int, default=6000)
+    ap.add_argument("--height", type=int, default=4000)
+    ap.add_argument("--worker", choices=("make", "legacy", "fast"), help=argparse.SUPPRESS)
+    ap.add_argument("paths", nargs="*", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.worker == "make":
+        make_photos(args.paths[0], args.count, (args.width, args.height))
+        return
+    if args.worker:
+        worker(args.worker, args.paths)
+        return
+
+    script = os.path.abspath(__file__)
+    with tempfile.TemporaryDirectory() as tmp:
+        # generated in a child too: peak RSS carries over from a parent into its children
+        subprocess.run(
+            [sys.executable, script, "--worker", "make", "--count", str(args.count), "--width", str(args.width), "--height", str(args.height), tmp],
+            check=True,
+        )
+        paths = sorted(os.path.join(tmp, name) for name in os.listdir(tmp))
+        mp = args.width * args.height / 1e6
+        print(f"{args.count} JPEGs of {args.width}x{args.height} ({mp:.0f} MP)")
+        for mode in ("legacy", "fast"):
+            out = subprocess.run(
+                [sys.executable, script, "--worker", mode, *paths],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            per_image, peak = out.split()
+            rss = f"{int(peak) / 1024:8.1f} MiB" if resource else "n/a"
+            print(f"{mode:<7} {float(per_image) * 1000:9.1f} ms/image  peak RSS {rss}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Benchmark scheduler.Scheduler with many pending jobs.
+
+Schedules N jobs spread over a few seconds, then reports memory held per
+pending job and dispatch jitter (how late each job ran compared to its due
+time).
+
+    python scripts/bench_scheduler.py --jobs 100000 --spread 5
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+
+from scheduler import Scheduler
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--jobs", type=int, default=100000)
+    ap.add_argument("--spread", type=float, default=5.0, help="seconds over which jobs fall due")
+    ap.add_argument("--workers", type=int, default=4)
+    args = ap.parse_args()
+
+    s = Scheduler(max_workers=args.workers)
+    jitter = []
+    done = threading.Event()
+
+    def on_post(due):
+        jitter.append(time.monotonic() - due)
+        if len(jitter) == args.jobs:
+            done.set()
+
+    lead = 2.0  # leave time to queue everything before the first job is due
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.monotonic()
+    for i in range(args.jobs):
+        delay = lead + args.spread * i / args.jobs
+        s.schedule(delay, on_post, time.monotonic() + delay)
+    queued = time.monotonic() - start
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print(f"queued {args.jobs} jobs in {queued:.2f}s, {s.pending()} pending, threads alive: {threading.active_count()}")
+    print(f"memory: {held / 1e6:.1f} MB total, {held / args.jobs:.0f} bytes per pending job")
+
+    done.wait(lead + args.spread + 60)
+    s.shutdown()
+    ms = [j * 1000 for j in jitter]
+    print(
+        f"jitter over {len(ms)} jobs: p50 {percentile(ms, 50):.2f} ms  p99 {percentile(ms, 99):.2f} ms  max {max(ms):.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
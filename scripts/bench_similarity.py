@@ -0,0 +1,99 @@
+"""Benchmark "Find Similar" on a large image library.
+
+Compares the old approach (list_images() then a Python loop scoring every
+image) against similarity_index: one build, then vectorized top-k queries.
+Runs against a temporary database.
+
+    python scripts/bench_similarity.py --rows 100000 --queries 50
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+
+import db
+import image_db
+import similarity_index
+
+
+def legacy_find_similar(image_id, k=5):
+    src = image_db.get_image(image_id)
+
+    def color_dist(a, b):
+        if not a or not b:
+            return float("inf")
+        return sum((a[i] - b[i]) ** 2 for i in range(3)) ** 0.5
+
+    candidates = []
+    for img in image_db.list_images():
+        if img["id"] == image_id:
+            continue
+        sm, im = src.get("metadata", {}), img.get("metadata", {})
+        size_diff = abs((sm.get("width") or 0) - (im.get("width") or 0)) + abs((sm.get("height") or 0) - (im.get("height") or 0))
+        candidates.append((color_dist(sm.get("avg_color"), im.get("avg_color")) + size_diff / 100.0, img))
+    candidates.sort(key=lambda x: x[0])
+    return [(c[1]["id"], c[0]) for c in candidates[:k]]
+
+
+def populate(rows):
+    rng = random.Random(0)
+    image_db.add_images(
+        [
+            {
+                "path": f"img{i}.jpg",
+                "title": f"image {i}",
+                "metadata": {"width": rng.randrange(200, 4000), "height": rng.randrange(200, 4000), "avg_color": [rng.randrange(256) for _ in range(3)]},
+            }
+            for i in range(rows)
+        ]
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=100000)
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--legacy-queries", type=int, default=3, help="the old loop is slow; fewer queries")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        image_db.DB_PATH = os.path.join(tmp, "images.sqlite3")
+        image_db.init_db()
+        populate(args.rows)
+        rng = random.Random(1)
+        targets = [rng.randrange(1, args.rows + 1) for _ in range(max(args.queries, args.legacy_queries))]
+
+        start = time.perf_counter()
+        for t in targets[: args.legacy_queries]:
+            legacy_find_similar(t)
+        legacy = (time.perf_counter() - start) / args.legacy_queries
+
+        index = similarity_index.get_index()
+        start = time.perf_counter()
+        index.build()
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        for t in targets[: args.queries]:
+            index.similar(t)
+        query = (time.perf_counter() - start) / args.queries
+
+        start = time.perf_counter()
+        image_db.add_image("new.jpg", metadata={"width": 800, "height": 600, "avg_color": [1, 2, 3]})
+        add = time.perf_counter() - start
+
+        print(f"rows {args.rows}  numpy {'yes' if similarity_index.np is not None else 'no'}")
+        print(f"legacy loop     {legacy * 1000:10.1f} ms/query")
+        print(f"index build     {build * 1000:10.1f} ms (once)")
+        print(f"index query     {query * 1000:10.2f} ms/query  ({legacy / query:.0f}x)")
+        print(f"add_image+sync  {add * 1000:10.2f} ms")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
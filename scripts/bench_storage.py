@@ -0,0 +1,116 @@
+"""Benchmark storage.py throughput.
+
+1. Settings reads/writes from many threads: the old connect-per-call,
+   single-global-lock access pattern against the pooled WAL connections in db.py.
+2. Scheduled-post writes: one transaction per row against the batched
+   add_scheduled_posts / mark_scheduled_sent_many.
+
+Runs against a temporary database so the real .bot.db is untouched.
+
+    python scripts/bench_storage.py --threads 16 --ops 2000 --rows 5000
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+
+import db
+import storage
+
+_legacy_lock = threading.Lock()
+
+
+def legacy_get_setting(key):
+    with _legacy_lock:
+        conn = sqlite3.connect(storage.DB_PATH, check_same_thread=False)
+        row = conn.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+        conn.close()
+        return row[0] if row else None
+
+
+def legacy_set_setting(key, value):
+    with _legacy_lock:
+        conn = sqlite3.connect(storage.DB_PATH, check_same_thread=False)
+        conn.execute("REPLACE INTO settings (key, value) VALUES (?,?)", (key, value))
+        conn.commit()
+        conn.close()
+
+
+def run(label, get, put, threads, ops, write_every):
+    def worker(n):
+        for i in range(ops):
+            if i % write_every == 0:
+                put(f"bench{n}", str(i))
+            else:
+                get(f"bench{n}")
+        db.close()
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+    total = threads * ops
+    print(f"{label:<8} {total:>8} ops  {elapsed:7.2f}s  {total / elapsed:10.0f} ops/sec")
+
+
+def run_batch(rows):
+    posts = [(f"post {i}", i) for i in range(rows)]
+
+    start = time.perf_counter()
+    ids = [storage.add_scheduled_post(c, t) for c, t in posts]
+    insert_row = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in ids:
+        storage.mark_scheduled_sent(i)
+    mark_row = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ids = storage.add_scheduled_posts(posts)
+    insert_batch = time.perf_counter() - start
+    start = time.perf_counter()
+    storage.mark_scheduled_sent_many(ids)
+    mark_batch = time.perf_counter() - start
+
+    for label, row_t, batch_t in (("insert", insert_row, insert_batch), ("mark", mark_row, mark_batch)):
+        print(
+            f"{label:<8} {rows:>8} rows  per-row {rows / row_t:10.0f} rows/sec  "
+            f"batched {rows / batch_t:10.0f} rows/sec  ({row_t / batch_t:.0f}x)"
+        )
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threads", type=int, default=16)
+    ap.add_argument("--ops", type=int, default=2000, help="operations per thread")
+    ap.add_argument("--write-every", type=int, default=10, help="one write per N operations")
+    ap.add_argument("--rows", type=int, default=5000, help="scheduled posts for the batch benchmark")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # legacy: default rollback journal, as the old code created the file
+        storage.DB_PATH = os.path.join(tmp, "legacy.db")
+        conn = sqlite3.connect(storage.DB_PATH)
+        conn.execute("CREATE TABLE settings (key TEXT PRIMARY KEY, value TEXT)")
+        conn.commit()
+        conn.close()
+        run("before", legacy_get_setting, legacy_set_setting, args.threads, args.ops, args.write_every)
+
+        storage.DB_PATH = os.path.join(tmp, "pooled.db")
+        storage.init_db()
+        run("after", storage.get_setting, storage.set_setting, args.threads, args.ops, args.write_every)
+        run_batch(args.rows)
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
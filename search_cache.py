@@ -0,0 +1,152 @@
+"""Single-file SQLite cache for image search results.
+
+Entries are keyed by the normalized query (case and whitespace folded) so
+near-identical queries share one entry. The store is bounded to
+``MAX_ENTRIES`` rows, evicting the least recently used. Entries older than
+``TTL`` are still served immediately while a background thread refreshes
+them (stale-while-revalidate); only a true miss waits for the providers.
+
+Usage:
+    results = search_cache.get_or_fetch(query, max_results, fetch)
+"""
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import db
+
+DB_PATH = os.path.join(os.getcwd(), ".image_search_cache.sqlite3")
+# seconds an entry is fresh; older entries are served stale and refreshed
+TTL = 60 * 60 * 12
+MAX_ENTRIES = 2000
+
+_lock = threading.Lock()
+_initialized: set = set()
+# keys being refreshed in the background
+_refreshing: set = set()
+_stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "evictions": 0}
+
+
+def normalize_query(query: str) -> str:
+    return " ".join((query or "").casefold().split())
+
+
+def cache_key(query: str, max_results: int) -> str:
+    return f"{normalize_query(query)}|{max_results}"
+
+
+def _init():
+    if DB_PATH in _initialized:
+        return
+    with db.write(DB_PATH) as conn:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS search_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_search_cache_last_used ON search_cache (last_used)")
+    with _lock:
+        _initialized.add(DB_PATH)
+
+
+def _count(name: str, n: int = 1):
+    with _lock:
+        _stats[name] += n
+
+
+def get(key: str, now: Optional[float] = None) -> Tuple[Optional[Any], bool]:
+    """Return ``(value, fresh)`` for ``key``; ``(None, False)`` when it is not cached."""
+    _init()
+    now = time.time() if now is None else now
+    with db.read(DB_PATH) as conn:
+        row = conn.execute("SELECT value, created_at FROM search_cache WHERE key = ?", (key,)).fetchone()
+    if row is None:
+        return None, False
+    with db.write(DB_PATH) as conn:
+        conn.execute("UPDATE search_cache SET last_used = ? WHERE key = ?", (now, key))
+    return json.loads(row[0]), now - row[1] < TTL
+
+
+def put(key: str, value: Any, now: Optional[float] = None):
+    """Store ``value`` under ``key`` and evict least recently used entries beyond MAX_ENTRIES."""
+    _init()
+    now = time.time() if now is None else now
+    with db.write(DB_PATH) as conn:
+        conn.execute(
+            "REPLACE INTO search_cache (key, value, created_at, last_used) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), now, now),
+        )
+        excess = conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0] - MAX_ENTRIES
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM search_cache WHERE key IN (SELECT key FROM search_cache ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+    if excess > 0:
+        _count("evictions", excess)
+
+
+def _refresh(key: str, fetch: Callable[[], Any]):
+    try:
+        value = fetch()
+        if value:
+            put(key, value)
+        _count("refreshes")
+    except Exception:
+        pass
+    finally:
+        with _lock:
+            _refreshing.discard(key)
+        db.close(DB_PATH)
+
+
+def get_or_fetch(query: str, max_results: int, fetch: Callable[[str, int], Any]) -> Any:
+    """Return cached results for ``query``, calling ``fetch(query, max_results)`` on a miss.
+
+    Stale entries are returned as they are and refreshed in a background
+    thread (at most one refresh per key at a time). Empty results are not cached.
+    """
+    key = cache_key(query, max_results)
+    try:
+        value, fresh = get(key)
+    except Exception:
+        # an unusable cache file must not break searching
+        value, fresh = None, False
+    if value is not None:
+        if fresh:
+            _count("hits")
+            return value
+        _count("stale_hits")
+        with _lock:
+            start = key not in _refreshing
+            _refreshing.add(key)
+        if start:
+            threading.Thread(target=_refresh, args=(key, lambda: fetch(query, max_results)), daemon=True).start()
+        return value
+    _count("misses")
+    value = fetch(query, max_results)
+    if value:
+        try:
+            put(key, value)
+        except Exception:
+            pass
+    return value
+
+
+def stats() -> Dict[str, int]:
+    """Counters since startup: hits, stale_hits, misses, refreshes, evictions."""
+    with _lock:
+        return dict(_stats)
+
+
+def clear():
+    _init()
+    with db.write(DB_PATH) as conn:
+        conn.execute("DELETE FROM search_cache")
@@ -0,0 +1,171 @@
+"""In-memory feature index for "Find Similar" over the image library.
+
+The average color, width and height of every image are kept in NumPy arrays,
+loaded from image_db once and then updated through image_db.subscribe() as
+images are added or re-analysed. A query scores every image in one vectorized
+pass and picks the top k with ``argpartition`` instead of decoding each
+metadata blob and looping in Python.
+
+Score (lower is more similar), as the library window has always ranked:
+    euclidean distance of avg_color + (|dw| + |dh|) / 100
+Images without an average color score ``inf`` and sort last.
+
+NumPy is optional; without it the same scores are computed in plain Python.
+"""
+import heapq
+import math
+from typing import Dict, List, Optional, Tuple
+
+import library_index
+from library_index import LibraryIndex
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only where numpy is missing
+    np = None
+
+_INITIAL_CAPACITY = 1024
+
+
+def _features(metadata: Optional[Dict]) -> Tuple[Optional[Tuple[float, float, float]], float, float]:
+    metadata = metadata or {}
+    color = metadata.get("avg_color")
+    try:
+        color = (float(color[0]), float(color[1]), float(color[2])) if color else None
+    except (TypeError, ValueError, IndexError):
+        color = None
+    return color, float(metadata.get("width") or 0), float(metadata.get("height") or 0)
+
+
+class SimilarityIndex(LibraryIndex):
+    """Feature arrays for one image database, kept in sync with it."""
+
+    def __init__(self, path: Optional[str] = None):
+        super().__init__(path)
+        self._pos: Dict[int, int] = {}
+        self._size = 0
+        if np is not None:
+            self._ids = np.zeros(_INITIAL_CAPACITY, dtype=np.int64)
+            self._colors = np.full((_INITIAL_CAPACITY, 3), np.nan, dtype=np.float32)
+            self._dims = np.zeros((_INITIAL_CAPACITY, 2), dtype=np.float32)
+        else:
+            self._rows: List[list] = []
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _load(self, conn):
+        # typed columns only: no metadata JSON is decoded
+        return [
+            (image_id, ((r, g, b) if r is not None else None, float(w or 0), float(h or 0)))
+            for image_id, w, h, r, g, b in conn.execute("SELECT id, width, height, avg_r, avg_g, avg_b FROM images")
+        ]
+
+    def _value(self, metadata):
+        return _features(metadata)
+
+    def _reset(self, n: int):
+        self._pos.clear()
+        self._size = 0
+        if np is not None:
+            self._reserve(n)
+        else:
+            self._rows = []
+
+    def _reserve(self, n: int):
+        cap = len(self._ids)
+        if n <= cap:
+            return
+        while cap < n:
+            cap *= 2
+        ids = np.zeros(cap, dtype=np.int64)
+        colors = np.full((cap, 3), np.nan, dtype=np.float32)
+        dims = np.zeros((cap, 2), dtype=np.float32)
+        ids[: self._size] = self._ids[: self._size]
+        colors[: self._size] = self._colors[: self._size]
+        dims[: self._size] = self._dims[: self._size]
+        self._ids, self._colors, self._dims = ids, colors, dims
+
+    def _put(self, image_id: int, feats):
+        color, w, h = feats
+        pos = self._pos.get(image_id)
+        if pos is None:
+            pos = self._pos[image_id] = self._size
+            self._size += 1
+            if np is None:
+                self._rows.append(None)
+            else:
+                self._reserve(self._size)
+        if np is None:
+            self._rows[pos] = [image_id, color, w, h]
+            return
+        self._ids[pos] = image_id
+        self._colors[pos] = color if color is not None else (np.nan, np.nan, np.nan)
+        self._dims[pos] = (w, h)
+
+    def similar(self, image_id: int, k: int = 5) -> List[Tuple[int, float]]:
+        """Return up to ``k`` ``(image_id, score)`` pairs most similar to a library image."""
+        self.ensure_built()
+        with self._lock:
+            pos = self._pos.get(image_id)
+            if pos is None:
+                return []
+            if np is not None:
+                color = self._colors[pos]
+                feats = (None if np.isnan(color[0]) else tuple(color), *self._dims[pos])
+            else:
+                feats = tuple(self._rows[pos][1:])
+        return self.similar_to(feats, k=k, exclude=image_id)
+
+    def similar_to(self, feats, k: int = 5, exclude: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Top-``k`` images for ``feats``, either a metadata dict or ``(avg_color, width, height)``."""
+        if isinstance(feats, dict):
+            feats = _features(feats)
+        color, w, h = feats
+        self.ensure_built()
+        with self._lock:
+            if np is None:
+                return self._similar_py(color, w, h, k, exclude)
+            n = self._size
+            if n == 0 or k <= 0:
+                return []
+            size_diff = np.abs(self._dims[:n, 0] - w) + np.abs(self._dims[:n, 1] - h)
+            if color is None:
+                scores = np.full(n, np.inf, dtype=np.float32)
+            else:
+                delta = self._colors[:n] - np.asarray(color, dtype=np.float32)
+                dist = np.sqrt(np.einsum("ij,ij->i", delta, delta))
+                # NaN rows have no avg_color
+                scores = np.where(np.isnan(dist), np.inf, dist + size_diff / 100.0)
+            ids = self._ids[:n]
+            if exclude is not None and exclude in self._pos:
+                keep = np.ones(n, dtype=bool)
+                keep[self._pos[exclude]] = False
+                scores, ids = scores[keep], ids[keep]
+            if scores.size == 0:
+                return []
+            if k < scores.size:
+                top = np.argpartition(scores, k - 1)[:k]
+            else:
+                top = np.arange(scores.size)
+            top = top[np.argsort(scores[top], kind="stable")]
+            return [(int(ids[i]), float(scores[i])) for i in top]
+
+    def _similar_py(self, color, w, h, k, exclude):
+        def score(row):
+            if color is None or row[1] is None:
+                return math.inf
+            return math.dist(color, row[1]) + (abs(w - row[2]) + abs(h - row[3])) / 100.0
+
+        scored = ((score(row), row[0]) for row in self._rows if row[0] != exclude)
+        return [(image_id, s) for s, image_id in heapq.nsmallest(k, scored)]
+
+
+def get_index() -> SimilarityIndex:
+    """Return the shared index for the current image_db.DB_PATH (see library_index.shared)."""
+    return library_index.shared(SimilarityIndex)
+
+
+def find_similar(image_id: int, k: int = 5) -> List[Tuple[int, float]]:
+    """Top-``k`` ``(image_id, score)`` pairs most similar to ``image_id`` in the library."""
+    return get_index().similar(image_id, k)
@@ -1,21 +1,46 @@
 import sqlite3
 import threading
 import time
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable, Tuple
+
+import db
 
 DB_PATH = "./.bot.db"
-_lock = threading.Lock()
 
+# how long a claimed post stays in_flight before another poller may reclaim it
+DEFAULT_LEASE_SECONDS = 300
+SCHEDULED_STATUSES = ("pending", "in_flight", "sent")
+# sent posts older than this many days move to scheduled_archive (setting ARCHIVE_AFTER_DAYS overrides)
+DEFAULT_ARCHIVE_AFTER_DAYS = 30
+# seconds between run_maintenance() calls made by the app
+MAINTENANCE_INTERVAL = 60 * 60
 
-def _get_conn():
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
+# In-memory copy of the settings table. Loaded on first read, kept current by
+# set_setting (write-through) and dropped by invalidate_settings_cache(). Each
+# read compares the settings_version row (bumped by triggers on every change,
+# from any process) with the version the copy was loaded at and reloads on a
+# mismatch, so a setting changed by another process sharing .bot.db is seen.
+_settings_lock = threading.Lock()
+_settings_cache: Optional[Dict[str, str]] = None
+_settings_cache_path: Optional[str] = None
+_settings_cache_version: Optional[int] = None
+# bumped on every change so a load racing with a write never installs stale data
+_settings_generation = 0
+# key (or None for every key) -> callbacks called as callback(key, value)
+_setting_subscribers: Dict[Optional[str], List[Callable[[str, Optional[str]], None]]] = {}
+# callbacks called as callback(run_at) whenever a post is queued or re-queued
+_scheduled_subscribers: List[Callable[[int], None]] = []
 
 
 def init_db():
-    with _lock:
-        conn = _get_conn()
-        cur = conn.cursor()
-        cur.execute(
+    # incremental auto-vacuum lets run_maintenance() return freed pages a few at a time;
+    # switching an existing file over needs a one-time full VACUUM
+    with db.exclusive(DB_PATH) as conn:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+    with db.write(DB_PATH) as conn:
+        conn.execute(
             """
         CREATE TABLE IF NOT EXISTS settings (
             key TEXT PRIMARY KEY,
@@ -23,7 +48,18 @@ def init_db():
         )
         """
         )
-        cur.execute(
+        conn.execute("CREATE TABLE IF NOT EXISTS settings_version (id INTEGER PRIMARY KEY CHECK (id = 0), version INTEGER NOT NULL)")
+        conn.execute("INSERT OR IGNORE INTO settings_version (id, version) VALUES (0, 0)")
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(
+                f"""
+        CREATE TRIGGER IF NOT EXISTS settings_version_{event.lower()} AFTER {event} ON settings
+        BEGIN
+            UPDATE settings_version SET version = version + 1 WHERE id = 0;
+        END
+        """
+            )
+        conn.execute(
             """
         CREATE TABLE IF NOT EXISTS scheduled (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -33,68 +69,350 @@ def init_db():
         )
         """
         )
-        conn.commit()
-        conn.close()
+        db.ensure_columns(conn, "scheduled", {"lease_until": "INTEGER", "lease_owner": "TEXT", "sent_at": "INTEGER"})
+        # serves both the due-job claim and next_due_time() without a table scan
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_scheduled_status_run_at ON scheduled (status, run_at)")
+        conn.execute(
+            """
+        CREATE TABLE IF NOT EXISTS scheduled_archive (
+            id INTEGER PRIMARY KEY,
+            content TEXT NOT NULL,
+            run_at INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            sent_at INTEGER,
+            archived_at INTEGER NOT NULL
+        )
+        """
+        )
 
 
-def set_setting(key: str, value: str):
-    with _lock:
-        conn = _get_conn()
-        cur = conn.cursor()
-        cur.execute("REPLACE INTO settings (key, value) VALUES (?,?)", (key, value))
-        conn.commit()
-        conn.close()
+def _notify_setting(key: str, value: Optional[str]):
+    with _settings_lock:
+        callbacks = list(_setting_subscribers.get(key, [])) + list(_setting_subscribers.get(None, []))
+    for cb in callbacks:
+        try:
+            cb(key, value)
+        except Exception:
+            # a broken subscriber must not break the write
+            pass
 
 
-def get_setting(key: str) -> Optional[str]:
-    # Try to query; if the DB/tables aren't initialized, initialize them outside the lock and retry.
+def subscribe_setting(callback: Callable[[str, Optional[str]], None], key: Optional[str] = None):
+    """Call ``callback(key, value)`` whenever ``key`` (or any key if None) changes."""
+    with _settings_lock:
+        _setting_subscribers.setdefault(key, []).append(callback)
+    return callback
+
+
+def unsubscribe_setting(callback: Callable[[str, Optional[str]], None], key: Optional[str] = None):
+    with _settings_lock:
+        callbacks = _setting_subscribers.get(key, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+
+def invalidate_settings_cache():
+    """Drop cached settings so the next read reloads them from the database."""
+    global _settings_cache, _settings_generation
+    with _settings_lock:
+        _settings_cache = None
+        _settings_generation += 1
+
+
+def _settings_version() -> int:
+    with db.read(DB_PATH) as conn:
+        return conn.execute("SELECT version FROM settings_version WHERE id = 0").fetchone()[0]
+
+
+def _select_settings() -> Tuple[Dict[str, str], int]:
+    # version first: a change landing in between makes the copy look older, never newer
+    version = _settings_version()
+    with db.read(DB_PATH) as conn:
+        return dict(conn.execute("SELECT key, value FROM settings").fetchall()), version
+
+
+def _load_settings() -> Dict[str, str]:
+    global _settings_cache, _settings_cache_path, _settings_cache_version
     try:
-        with _lock:
-            conn = _get_conn()
-            cur = conn.cursor()
-            cur.execute("SELECT value FROM settings WHERE key = ?", (key,))
-            row = cur.fetchone()
-            conn.close()
-            return row[0] if row else None
+        version = _settings_version()
     except sqlite3.OperationalError:
-        # Tables missing — initialize DB without holding the lock to avoid deadlock, then retry
+        # Tables missing — initialize DB and retry
         init_db()
-        with _lock:
-            conn = _get_conn()
-            cur = conn.cursor()
-            cur.execute("SELECT value FROM settings WHERE key = ?", (key,))
-            row = cur.fetchone()
-            conn.close()
-            return row[0] if row else None
+        version = _settings_version()
+    with _settings_lock:
+        previous = _settings_cache if _settings_cache_path == DB_PATH else None
+        if previous is not None and _settings_cache_version == version:
+            return previous
+        generation = _settings_generation
+    settings, version = _select_settings()
+    with _settings_lock:
+        if generation == _settings_generation:
+            _settings_cache = settings
+            _settings_cache_path = DB_PATH
+            _settings_cache_version = version
+    if previous is not None:
+        # changed by another process (or behind the cache): tell subscribers
+        for key in set(previous) | set(settings):
+            if previous.get(key) != settings.get(key):
+                _notify_setting(key, settings.get(key))
+    return settings
+
+
+def set_setting(key: str, value: str):
+    global _settings_generation, _settings_cache_version
+    with db.write(DB_PATH) as conn:
+        conn.execute("REPLACE INTO settings (key, value) VALUES (?,?)", (key, value))
+        version = conn.execute("SELECT version FROM settings_version WHERE id = 0").fetchone()[0]
+    with _settings_lock:
+        _settings_generation += 1
+        changed = True
+        if _settings_cache is not None and _settings_cache_path == DB_PATH:
+            changed = _settings_cache.get(key) != value
+            _settings_cache[key] = value
+            # the copy stays current only if this write is the one change since it was loaded
+            if _settings_cache_version == version - 1:
+                _settings_cache_version = version
+    if changed:
+        _notify_setting(key, value)
+
+
+def get_setting(key: str) -> Optional[str]:
+    return _load_settings().get(key)
+
+
+def subscribe_scheduled(callback: Callable[[int], None]):
+    """Call ``callback(run_at)`` whenever a post is queued, so waiters can wake early."""
+    with _settings_lock:
+        _scheduled_subscribers.append(callback)
+    return callback
+
+
+def unsubscribe_scheduled(callback: Callable[[int], None]):
+    with _settings_lock:
+        if callback in _scheduled_subscribers:
+            _scheduled_subscribers.remove(callback)
+
+
+def _notify_scheduled(run_at: int):
+    with _settings_lock:
+        callbacks = list(_scheduled_subscribers)
+    for cb in callbacks:
+        try:
+            cb(run_at)
+        except Exception:
+            pass
 
 
 def add_scheduled_post(content: str, run_at: int) -> int:
-    with _lock:
-        conn = _get_conn()
-        cur = conn.cursor()
-        cur.execute("INSERT INTO scheduled (content, run_at) VALUES (?,?)", (content, run_at))
-        conn.commit()
+    with db.write(DB_PATH) as conn:
+        cur = conn.execute("INSERT INTO scheduled (content, run_at) VALUES (?,?)", (content, run_at))
         rowid = cur.lastrowid
-        conn.close()
-        return rowid
+    _notify_scheduled(run_at)
+    return rowid
+
+
+def add_scheduled_posts(posts: List[Tuple[str, int]]) -> List[int]:
+    """Queue many ``(content, run_at)`` posts in one transaction. Returns their ids in order."""
+    posts = list(posts)
+    if not posts:
+        return []
+    with db.write(DB_PATH) as conn:
+        conn.executemany("INSERT INTO scheduled (content, run_at) VALUES (?,?)", posts)
+        # the write lock is held for the whole transaction, so AUTOINCREMENT ids are contiguous
+        last = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+    _notify_scheduled(min(run_at for _, run_at in posts))
+    return list(range(last - len(posts) + 1, last + 1))
 
 
 def list_scheduled() -> List[Dict[str, Any]]:
-    with _lock:
-        conn = _get_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT id, content, run_at, status FROM scheduled ORDER BY run_at")
-        rows = cur.fetchall()
-        conn.close()
+    with db.read(DB_PATH) as conn:
+        rows = conn.execute("SELECT id, content, run_at, status FROM scheduled ORDER BY run_at").fetchall()
         return [
             {"id": r[0], "content": r[1], "run_at": r[2], "status": r[3]} for r in rows
         ]
 
 
+def claim_due_posts(
+    now: Optional[int] = None, limit: int = 50, lease_seconds: int = DEFAULT_LEASE_SECONDS, owner: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Atomically move up to ``limit`` due posts to ``in_flight`` and return them.
+
+    A claimed post holds a lease for ``owner`` until ``now + lease_seconds``;
+    the owner keeps it alive with renew_leases(). If it is neither marked sent
+    nor released before then (e.g. the process died mid-publish) it becomes
+    claimable again, by this or any other process sharing the database.
+    """
+    now = int(time.time()) if now is None else int(now)
+    with db.write(DB_PATH) as conn:
+        rows = conn.execute(
+            "SELECT id, content, run_at FROM scheduled WHERE status = 'in_flight' AND lease_until <= ? ORDER BY run_at LIMIT ?",
+            (now, limit),
+        ).fetchall()
+        if len(rows) < limit:
+            rows += conn.execute(
+                "SELECT id, content, run_at FROM scheduled WHERE status = 'pending' AND run_at <= ? ORDER BY run_at LIMIT ?",
+                (now, limit - len(rows)),
+            ).fetchall()
+        lease_until = now + lease_seconds
+        conn.executemany(
+            "UPDATE scheduled SET status = 'in_flight', lease_until = ?, lease_owner = ? WHERE id = ?",
+            [(lease_until, owner, r[0]) for r in rows],
+        )
+    return [
+        {"id": r[0], "content": r[1], "run_at": r[2], "status": "in_flight", "lease_until": lease_until, "lease_owner": owner}
+        for r in rows
+    ]
+
+
+def renew_leases(post_ids: List[int], owner: Optional[str], lease_seconds: int = DEFAULT_LEASE_SECONDS, now: Optional[int] = None) -> int:
+    """Heartbeat: extend the leases ``owner`` still holds. Returns how many were extended."""
+    post_ids = list(post_ids)
+    if not post_ids:
+        return 0
+    now = int(time.time()) if now is None else int(now)
+    with db.write(DB_PATH) as conn:
+        cur = conn.executemany(
+            "UPDATE scheduled SET lease_until = ? WHERE id = ? AND status = 'in_flight' AND lease_owner IS ?",
+            [(now + lease_seconds, i, owner) for i in post_ids],
+        )
+        return cur.rowcount
+
+
+def next_due_time() -> Optional[int]:
+    """Return the earliest time a post becomes claimable, or None if nothing is queued."""
+    with db.read(DB_PATH) as conn:
+        row = conn.execute(
+            "SELECT (SELECT MIN(run_at) FROM scheduled WHERE status = 'pending'),"
+            " (SELECT MIN(lease_until) FROM scheduled WHERE status = 'in_flight')"
+        ).fetchone()
+    times = [t for t in row if t is not None]
+    return min(times) if times else None
+
+
+def release_scheduled_post(post_id: int, retry_at: Optional[int] = None, owner: Optional[str] = None):
+    """Return a claimed post to the queue so it is retried, optionally not before ``retry_at``."""
+    set_scheduled_status([post_id], "pending", from_status="in_flight", run_at=retry_at, owner=owner)
+
+
+def _update_status(
+    conn, ids: List[int], status: str, from_status: Optional[str] = None, run_at: Optional[int] = None, owner: Optional[str] = None
+) -> int:
+    sql = (
+        "UPDATE scheduled SET status = ?, lease_until = NULL, lease_owner = NULL, run_at = COALESCE(?, run_at), sent_at = ?"
+        " WHERE id = ?"
+    )
+    sent_at = int(time.time()) if status == "sent" else None
+    params = [(status, run_at, sent_at, i) for i in ids]
+    if from_status is not None:
+        sql += " AND status = ?"
+        params = [p + (from_status,) for p in params]
+    if owner is not None:
+        # a lease that expired and was reclaimed by another worker is no longer ours to settle
+        sql += " AND lease_owner = ?"
+        params = [p + (owner,) for p in params]
+    cur = conn.executemany(sql, params)
+    return cur.rowcount
+
+
+def set_scheduled_status(
+    ids: List[int], status: str, from_status: Optional[str] = None, run_at: Optional[int] = None, owner: Optional[str] = None
+) -> int:
+    """Move many posts to ``status`` in one transaction and return how many changed.
+
+    With ``from_status`` only posts currently in that status are moved, which
+    makes the transition safe against concurrent changes; with ``owner`` only
+    posts leased by that owner are. ``run_at`` optionally reschedules the
+    moved posts. Any lease is cleared.
+    """
+    for st in (status, from_status):
+        if st is not None and st not in SCHEDULED_STATUSES:
+            raise ValueError(f"unknown status: {st}")
+    ids = list(ids)
+    if not ids:
+        return 0
+    with db.write(DB_PATH) as conn:
+        changed = _update_status(conn, ids, status, from_status, run_at, owner)
+    if status == "pending" and changed:
+        _notify_scheduled(run_at if run_at is not None else int(time.time()))
+    return changed
+
+
+def record_publish_results(
+    sent_ids: List[int], failed_ids: List[int] = (), retry_at: Optional[int] = None, owner: Optional[str] = None
+):
+    """Apply a batch of publish outcomes in one transaction.
+
+    Sent posts are marked ``sent``; failed posts go back to ``pending`` and are
+    retried at ``retry_at`` (or as soon as possible when not given). With
+    ``owner`` only posts still leased by that owner are touched.
+    """
+    if not sent_ids and not failed_ids:
+        return
+    with db.write(DB_PATH) as conn:
+        _update_status(conn, sent_ids, "sent", from_status="in_flight" if owner else None, owner=owner)
+        _update_status(conn, failed_ids, "pending", from_status="in_flight", run_at=retry_at, owner=owner)
+    if failed_ids:
+        _notify_scheduled(retry_at if retry_at is not None else int(time.time()))
+
+
+def mark_scheduled_sent_many(post_ids: List[int]) -> int:
+    return set_scheduled_status(post_ids, "sent")
+
+
 def mark_scheduled_sent(post_id: int):
-    with _lock:
-        conn = _get_conn()
-        cur = conn.cursor()
-        cur.execute("UPDATE scheduled SET status = 'sent' WHERE id = ?", (post_id,))
-        conn.commit()
-        conn.close()
+    mark_scheduled_sent_many([post_id])
+
+
+def archive_sent_posts(older_than_days: Optional[float] = None, now: Optional[int] = None, batch_size: int = 1000) -> int:
+    """Move sent posts older than ``older_than_days`` to ``scheduled_archive``.
+
+    Rows move in batches of ``batch_size``, one short transaction each, so the
+    publisher is never blocked for long. Returns the number of rows archived.
+    """
+    if older_than_days is None:
+        try:
+            older_than_days = float(get_setting("ARCHIVE_AFTER_DAYS") or DEFAULT_ARCHIVE_AFTER_DAYS)
+        except ValueError:
+            older_than_days = DEFAULT_ARCHIVE_AFTER_DAYS
+    now = int(time.time()) if now is None else int(now)
+    cutoff = now - int(older_than_days * 86400)
+    moved = 0
+    while True:
+        with db.write(DB_PATH) as conn:
+            ids = [
+                (r[0],)
+                for r in conn.execute(
+                    "SELECT id FROM scheduled WHERE status = 'sent' AND COALESCE(sent_at, run_at) <= ? LIMIT ?",
+                    (cutoff, batch_size),
+                )
+            ]
+            conn.executemany(
+                "INSERT OR REPLACE INTO scheduled_archive (id, content, run_at, status, sent_at, archived_at)"
+                " SELECT id, content, run_at, status, sent_at, ? FROM scheduled WHERE id = ?",
+                [(now, i) for (i,) in ids],
+            )
+            conn.executemany("DELETE FROM scheduled WHERE id = ?", ids)
+        moved += len(ids)
+        if len(ids) < batch_size:
+            return moved
+
+
+def compact_db(max_pages: Optional[int] = None) -> int:
+    """Return free pages to the filesystem (all of them, or at most ``max_pages``).
+
+    Also checkpoints and truncates the WAL file. Returns the number of free
+    pages before compaction.
+    """
+    with db.exclusive(DB_PATH) as conn:
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if free:
+            conn.execute(f"PRAGMA incremental_vacuum({int(max_pages or 0)})").fetchall()
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+    return free
+
+
+def run_maintenance(max_pages: Optional[int] = None) -> Dict[str, int]:
+    """Archive old sent posts and compact the database file."""
+    archived = archive_sent_posts()
+    freed = compact_db(max_pages)
+    return {"archived": archived, "free_pages": freed}
@@ -0,0 +1,117 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import db
+import disk_lru
+import downloader
+import http_client
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits[self.path] = server.hits.get(self.path, 0) + 1
+        if self.path == "/slow":
+            time.sleep(0.3)
+        body = server.bodies.get(self.path, b"image-bytes")
+        etag = f'"{len(body)}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class TestDownloader(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        cls.server.lock = threading.Lock()
+        cls.server.bodies = {"/big": b"x" * 5000, "/copy": b"image-bytes"}
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self._orig = (downloader.CACHE_DIR, downloader.MAX_DOWNLOAD_BYTES, downloader.MAX_CACHE_BYTES, downloader.FRESH_SECONDS)
+        downloader.CACHE_DIR = os.path.join(self.tmpdir, "cache")
+        self.server.hits = {}
+
+    def tearDown(self):
+        if downloader._executor is not None:
+            downloader._executor.shutdown(wait=True)
+            downloader._executor = None
+        db.close()
+        http_client.close_all()
+        downloader.CACHE_DIR, downloader.MAX_DOWNLOAD_BYTES, downloader.MAX_CACHE_BYTES, downloader.FRESH_SECONDS = self._orig
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_concurrent_requests_coalesce(self):
+        futures = [downloader.fetch(self.base + "/slow") for _ in range(5)]
+        wait(futures)
+        self.assertEqual(len({id(f) for f in futures}), 1)
+        self.assertEqual(self.server.hits["/slow"], 1)
+        with open(futures[0].result(), "rb") as f:
+            self.assertEqual(f.read(), b"image-bytes")
+
+    def test_repeat_served_from_disk(self):
+        first = downloader.download(self.base + "/a")
+        out = downloader.download_to(self.base + "/a", os.path.join(self.tmpdir, "out.jpg"))
+        self.assertEqual(self.server.hits["/a"], 1)
+        self.assertEqual(downloader.download(self.base + "/a"), first)
+        with open(out, "rb") as f:
+            self.assertEqual(f.read(), b"image-bytes")
+        # same bytes from another URL share the blob
+        self.assertEqual(downloader.download(self.base + "/copy"), first)
+
+    def test_stale_entry_revalidated(self):
+        downloader.FRESH_SECONDS = 0
+        first = downloader.download(self.base + "/a")
+        self.assertEqual(downloader.download(self.base + "/a"), first)
+        # second request was a conditional GET answered with 304
+        self.assertEqual(self.server.hits["/a"], 2)
+        self.assertTrue(os.path.exists(first))
+
+    def test_max_download_bytes(self):
+        downloader.MAX_DOWNLOAD_BYTES = 1000
+        with self.assertRaises(downloader.DownloadTooLarge):
+            downloader.download(self.base + "/big")
+        leftovers = [n for n in os.listdir(downloader.CACHE_DIR) if n.endswith(".part")]
+        self.assertEqual(leftovers, [])
+
+    def test_cache_bounded(self):
+        downloader.MAX_CACHE_BYTES = 30
+        for i in range(3):
+            self.server.bodies[f"/n{i}"] = f"body-number-{i}".encode()
+            path = downloader.download(self.base + f"/n{i}")
+            os.utime(path, (i, i))
+        self.assertLessEqual(sum(size for _, size, _ in disk_lru.scan(downloader._blob_dir())), 30)
+        # the evicted URL is downloaded again
+        downloader.download(self.base + "/n0")
+        self.assertEqual(self.server.hits["/n0"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
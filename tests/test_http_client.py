@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import http_client
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body=b"ok"):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self):
+        server = self.server
+        with server.lock:
+            server.ports.add(self.client_address[1])
+            server.hits[self.path] = server.hits.get(self.path, 0) + 1
+            hits = server.hits[self.path]
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        if self.path.startswith("/flaky") and hits <= 2:
+            self._reply(503, b"busy")
+        elif self.path == "/big":
+            self._reply(200, b"x" * 200000)
+        else:
+            self._reply(200)
+
+    do_GET = _handle
+    do_POST = _handle
+
+
+class TestHttpClient(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        cls.server.lock = threading.Lock()
+        cls.server.ports = set()
+        cls.server.hits = {}
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self._orig_config = {h: dict(c) for h, c in http_client.HOST_CONFIG.items()}
+        http_client.configure_host("127.0.0.1", backoff_factor=0, timeout=(2, 5))
+        http_client._stats.clear()
+        self.server.ports.clear()
+        self.server.hits.clear()
+
+    def tearDown(self):
+        http_client.close_all()
+        http_client.HOST_CONFIG.clear()
+        http_client.HOST_CONFIG.update(self._orig_config)
+
+    def test_keep_alive_and_stats(self):
+        for _ in range(5):
+            self.assertEqual(http_client.get(self.base + "/ok").text, "ok")
+        # one pooled connection served every request
+        self.assertEqual(len(self.server.ports), 1)
+        st = http_client.stats()["127.0.0.1"]
+        self.assertEqual((st["requests"], st["errors"], st["bytes"]), (5, 0, 10))
+        self.assertGreater(st["latency_total"], 0)
+
+    def test_retries_get_but_not_post(self):
+        self.assertEqual(http_client.get(self.base + "/flaky-get").status_code, 200)
+        self.assertEqual(self.server.hits["/flaky-get"], 3)
+        self.assertEqual(http_client.stats()["127.0.0.1"]["retries"], 2)
+        self.assertEqual(http_client.post(self.base + "/flaky-post", data=b"x").status_code, 503)
+        self.assertEqual(self.server.hits["/flaky-post"], 1)
+        http_client.configure_host("127.0.0.1", retry_post=True)
+        self.assertEqual(http_client.post(self.base + "/flaky-post2", data=b"x").status_code, 200)
+
+    def test_download_to(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = http_client.download_to(self.base + "/big", os.path.join(tmpdir, "big.bin"))
+            self.assertEqual(os.path.getsize(path), 200000)
+            self.assertEqual(http_client.stats()["127.0.0.1"]["bytes"], 200000)
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
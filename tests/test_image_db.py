@@ -0,0 +1,141 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import db
+import image_db
+
+
+class TestImageDB(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self._orig_path = image_db.DB_PATH
+        image_db.DB_PATH = os.path.join(self.tmpdir, "images.sqlite3")
+        image_db.init_db()
+
+    def tearDown(self):
+        db.close()
+        image_db.DB_PATH = self._orig_path
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_add_get_list(self):
+        a = image_db.add_image("a.jpg", title="A", tags=["red", "mug"], metadata={"width": 10})
+        b = image_db.add_image("b.jpg", title="B", metadata={})
+        self.assertEqual([img["id"] for img in image_db.list_images()], [b, a])
+        img = image_db.get_image(a)
+        self.assertEqual(img["tags"], ["red", "mug"])
+        self.assertEqual(img["metadata"], {"width": 10})
+        self.assertIsNone(image_db.get_image(9999))
+
+    def test_keyset_pages(self):
+        ids = [image_db.add_image(f"{i}.jpg", title=str(i), metadata={}) for i in range(7)]
+        page = image_db.list_images_page(limit=3, columns=("title",))
+        self.assertEqual(page, [{"id": i, "title": str(i - ids[0])} for i in reversed(ids[-3:])])
+        page = image_db.list_images_page(after_id=page[-1]["id"], limit=3)
+        self.assertEqual([img["id"] for img in page], list(reversed(ids[1:4])))
+        self.assertEqual([img["id"] for img in image_db.iter_images(page_size=2)], list(reversed(ids)))
+        with self.assertRaises(ValueError):
+            image_db.list_images_page(columns=("nope",))
+
+    def test_tag_queries(self):
+        mug = image_db.add_image("mug.jpg", tags=["Red", "mug"], metadata={})
+        cup = image_db.add_image("cup.jpg", tags=["blue", "mug"], metadata={})
+        shirt = image_db.add_image("shirt.jpg", tags=["red", "shirt"], metadata={})
+        ids = lambda rows: [r["id"] for r in rows]
+        self.assertEqual(ids(image_db.images_with_tags(all_of=["red", "MUG"])), [mug])
+        self.assertEqual(ids(image_db.images_with_tags(any_of=["blue", "shirt"])), [shirt, cup])
+        self.assertEqual(ids(image_db.images_with_tags(all_of=["mug"], any_of=["blue", "red"])), [cup, mug])
+        self.assertEqual(image_db.tag_counts(limit=2), [("mug", 2), ("red", 2)])
+        image_db.update_image(mug, tags=["green"])
+        self.assertEqual(ids(image_db.images_with_tags(all_of=["green"])), [mug])
+        self.assertEqual(ids(image_db.images_with_tags(all_of=["red"])), [shirt])
+
+    def test_tag_migration(self):
+        # a library created before image_tags existed
+        with db.write(image_db.DB_PATH) as conn:
+            conn.execute("DROP TABLE image_tags")
+            conn.execute("INSERT INTO images (path, tags, metadata) VALUES ('old.jpg', 'vintage,lamp', '{}')")
+        image_db.init_db()
+        self.assertEqual(len(image_db.images_with_tags(all_of=["vintage", "lamp"])), 1)
+
+    def test_partial_update(self):
+        a = image_db.add_image("a.jpg", title="A", description="old", tags=["x"], metadata={"width": 10})
+        image_db.update_image(a, description="captioned")
+        img = image_db.get_image(a)
+        self.assertEqual((img["title"], img["description"], img["tags"]), ("A", "captioned", ["x"]))
+        self.assertEqual(img["metadata"], {"width": 10})
+
+    def test_full_text_search(self):
+        mug = image_db.add_image("mug.jpg", title="Autumn mug", description="steaming coffee", tags=["cafe"], metadata={})
+        latte = image_db.add_image("latte.jpg", title="Latte art", description="coffee on a table", metadata={})
+        beach = image_db.add_image("beach.jpg", title="Beach", description="sunset", tags=["summer"], metadata={})
+        ids = lambda rows: [r["id"] for r in rows]
+        self.assertEqual(set(ids(image_db.search_images_local("coffee"))), {mug, latte})
+        self.assertEqual(ids(image_db.search_images_local("autumn coffee")), [mug])
+        # any-word match ranks the title hit first
+        self.assertEqual(ids(image_db.search_images_local("latte coffee", match_all=False))[0], latte)
+        self.assertEqual(ids(image_db.search_images_local("summer")), [beach])
+        self.assertEqual(image_db.search_images_local('"); DROP'), [])
+        # triggers keep the index in sync with captions and deletes
+        image_db.update_image(beach, description="caption: golden hour")
+        self.assertEqual(ids(image_db.search_images_local("golden")), [beach])
+        self.assertEqual(image_db.search_images_local("sunset"), [])
+        with db.write(image_db.DB_PATH) as conn:
+            conn.execute("DELETE FROM images WHERE id = ?", (mug,))
+        self.assertEqual(ids(image_db.search_images_local("autumn")), [])
+
+    def test_fts_backfill(self):
+        # a library created before images_fts existed
+        with db.write(image_db.DB_PATH) as conn:
+            for name in ("images_fts_insert", "images_fts_delete", "images_fts_update"):
+                conn.execute(f"DROP TRIGGER {name}")
+            conn.execute("DROP TABLE images_fts")
+            conn.execute("INSERT INTO images (path, title, tags, metadata) VALUES ('old.jpg', 'Vintage lamp', '', '{}')")
+        image_db.init_db()
+        self.assertEqual(len(image_db.search_images_local("lamp")), 1)
+
+    def test_typed_metadata(self):
+        meta = {"width": 1600, "height": 900, "avg_color": [10, 20, 30], "phash": "ff00ff00ff00ff00", "exif": {"iso": 100}}
+        a = image_db.add_image("a.jpg", metadata=meta)
+        self.assertEqual(image_db.get_image(a)["metadata"], meta)
+        with db.read(image_db.DB_PATH) as conn:
+            row = conn.execute("SELECT width, height, avg_r, avg_g, avg_b, metadata FROM images WHERE id = ?", (a,)).fetchone()
+        self.assertEqual(row, (1600, 900, 10, 20, 30, '{"exif": {"iso": 100}}'))
+        self.assertEqual(image_db.list_images_page(columns=("metadata",))[0]["metadata"], meta)
+
+    def test_typed_metadata_migration(self):
+        # a library created before the typed columns existed
+        db.close()
+        os.remove(image_db.DB_PATH)
+        with db.write(image_db.DB_PATH) as conn:
+            conn.execute("CREATE TABLE images (id INTEGER PRIMARY KEY AUTOINCREMENT, path TEXT NOT NULL, title TEXT, description TEXT, tags TEXT, metadata TEXT)")
+            conn.execute("""INSERT INTO images (path, tags, metadata) VALUES ('old.jpg', '', '{"width": 800, "height": 600, "avg_color": [1, 2, 3], "dpi": 72}')""")
+            conn.execute("INSERT INTO images (path, tags, metadata) VALUES ('broken.jpg', '', 'not json')")
+        image_db.init_db()
+        old, broken = sorted(image_db.list_images(), key=lambda img: img["id"])
+        self.assertEqual(old["metadata"], {"width": 800, "height": 600, "avg_color": [1, 2, 3], "dpi": 72})
+        self.assertEqual(broken["metadata"], {})
+        self.assertEqual([img["id"] for img in image_db.query_images(min_width=800)], [old["id"]])
+
+    def test_query_images(self):
+        add = lambda w, h, color: image_db.add_image(f"{w}x{h}.jpg", metadata={"width": w, "height": h, "avg_color": color})
+        wide = add(1920, 1080, [200, 30, 30])
+        tall = add(1080, 1920, [30, 30, 200])
+        square = add(1300, 1300, [190, 40, 20])
+        small = add(640, 480, [0, 0, 0])
+        image_db.add_image("none.jpg", metadata={})
+        ids = lambda rows: [r["id"] for r in rows]
+        self.assertEqual(ids(image_db.query_images(min_width=1201, orientation="landscape")), [wide])
+        self.assertEqual(ids(image_db.query_images(orientation="portrait")), [tall])
+        self.assertEqual(ids(image_db.query_images(max_height=1300, max_width=1300)), [small, square])
+        self.assertEqual(ids(image_db.query_images(near_color=(200, 30, 30), limit=2)), [wide, square])
+        self.assertEqual(ids(image_db.query_images(near_color=(200, 30, 30), max_color_distance=20)), [wide, square])
+        self.assertEqual(ids(image_db.query_images(near_color=(200, 30, 30), max_color_distance=5)), [wide])
+        self.assertEqual(ids(image_db.query_images(min_width=1000, after_id=square)), [tall, wide])
+        with self.assertRaises(ValueError):
+            image_db.query_images(orientation="diagonal")
+
+
+if __name__ == "__main__":
+    unittest.main()
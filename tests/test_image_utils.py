@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from PIL import Image
+
+import image_utils
+
+
+class TestComputeImageMetadata(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _save(self, im, name, **kwargs):
+        path = os.path.join(self.tmpdir, name)
+        im.save(path, **kwargs)
+        return path
+
+    def test_large_jpeg_from_thumbnail(self):
+        im = Image.new("RGB", (4000, 3000), (200, 100, 50))
+        im.paste((0, 0, 0), (0, 0, 2000, 3000))
+        path = self._save(im, "big.jpg", quality=95)
+        meta = image_utils.compute_image_metadata(path)
+        self.assertEqual((meta["width"], meta["height"]), (4000, 3000))
+        for got, want in zip(meta["avg_color"], (100, 50, 25)):
+            self.assertAlmostEqual(got, want, delta=3)
+        if meta.get("phash") is not None:
+            # same picture at another size: near-identical hash
+            small = self._save(im.resize((800, 600)), "small.jpg", quality=95)
+            other = image_utils.compute_image_metadata(small)["phash"]
+            self.assertLessEqual(image_utils.hamming_distance_hex(meta["phash"], other), 4)
+
+    def test_palette_and_alpha_images(self):
+        path = self._save(Image.new("P", (300, 200), 3), "pal.png")
+        meta = image_utils.compute_image_metadata(path)
+        self.assertEqual((meta["width"], meta["height"]), (300, 200))
+        self.assertEqual(len(meta["avg_color"]), 3)
+        path = self._save(Image.new("RGBA", (50, 40), (10, 20, 30, 255)), "rgba.png")
+        self.assertEqual(tuple(image_utils.compute_image_metadata(path)["avg_color"]), (10, 20, 30))
+
+    def test_unreadable(self):
+        path = os.path.join(self.tmpdir, "bad.jpg")
+        with open(path, "wb") as f:
+            f.write(b"nope")
+        self.assertEqual(image_utils.compute_image_metadata(path), {"width": None, "height": None, "avg_color": None})
+
+
+class TestSearchProviders(unittest.TestCase):
+    def setUp(self):
+        self._orig = dict(image_utils._providers)
+        image_utils._providers.clear()
+
+    def tearDown(self):
+        image_utils._providers.clear()
+        image_utils._providers.update(self._orig)
+
+    def _provider(self, delay, urls, fail=False):
+        def search(query, max_results):
+            time.sleep(delay)
+            if fail:
+                raise RuntimeError("down")
+            return [{"url": u, "source": "test"} for u in urls][:max_results]
+
+        return search
+
+    def test_merged_by_priority(self):
+        image_utils.register_provider("slow", self._provider(0.2, ["a", "b"]), priority=0)
+        image_utils.register_provider("fast", self._provider(0.0, ["b", "c"]), priority=5)
+        image_utils.register_provider("broken", self._provider(0.0, [], fail=True), priority=1)
+        seen = []
+        res = image_utils.search_all_providers("q", max_results=6, on_results=seen.append)
+        self.assertEqual([r["url"] for r in res], ["a", "b", "c"])
+        self.assertEqual([r["url"] for r in seen[0]], ["b", "c"])
+
+    def test_first_results_win_and_deadline(self):
+        image_utils.register_provider("slow", self._provider(2.0, ["a"]), priority=0)
+        image_utils.register_provider("fast", self._provider(0.0, ["b", "c", "d"]), priority=5)
+        start = time.monotonic()
+        res = image_utils.search_all_providers("q", max_results=6, min_results=3)
+        self.assertEqual([r["url"] for r in res], ["b", "c", "d"])
+        self.assertLess(time.monotonic() - start, 1.0)
+        # not enough results: waits no longer than the deadline
+        start = time.monotonic()
+        res = image_utils.search_all_providers("q", max_results=6, deadline=0.3)
+        self.assertEqual(len(res), 3)
+        self.assertLess(time.monotonic() - start, 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from PIL import Image
+
+import db
+import image_db
+import image_utils
+import ingest
+
+
+class TestIngest(unittest.TestCase):
+    EMPTY = {"added": 0, "refreshed": 0, "skipped": 0, "duplicates": 0, "failed": 0, "missing": 0}
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self._orig_path = image_db.DB_PATH
+        image_db.DB_PATH = os.path.join(self.tmpdir, "images.sqlite3")
+        self.root = os.path.join(self.tmpdir, "catalog")
+        os.makedirs(os.path.join(self.root, "sub"))
+        for i, color in enumerate([(255, 0, 0), (0, 255, 0), (0, 0, 255)]):
+            folder = self.root if i < 2 else os.path.join(self.root, "sub")
+            Image.new("RGB", (40 + i, 30), color).save(os.path.join(folder, f"img{i}.png"))
+        with open(os.path.join(self.root, "broken.jpg"), "wb") as f:
+            f.write(b"not an image")
+        with open(os.path.join(self.root, "notes.txt"), "w") as f:
+            f.write("ignored")
+
+    def tearDown(self):
+        db.close()
+        image_db.DB_PATH = self._orig_path
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_ingest_directory(self):
+        calls = []
+        stats = ingest.ingest_directory(self.root, workers=2, batch_size=2, tags=["catalog"], progress=lambda d, t: calls.append((d, t)))
+        self.assertEqual(stats, dict(self.EMPTY, added=3, failed=1))
+        self.assertEqual(calls[-1], (4, 4))
+        images = {img["title"]: img for img in image_db.list_images()}
+        self.assertEqual(sorted(images), ["img0", "img1", "img2"])
+        self.assertEqual(images["img2"]["metadata"]["width"], 42)
+        self.assertEqual(images["img0"]["tags"], ["catalog"])
+
+        # resumable: a second run only looks at new files; a copy of an imported file is not added again
+        Image.new("RGB", (10, 10), (9, 9, 9)).save(os.path.join(self.root, "img3.png"))
+        shutil.copy(os.path.join(self.root, "img0.png"), os.path.join(self.root, "sub", "copy.png"))
+        stats = ingest.ingest_directory(self.root, workers=0)
+        self.assertEqual(stats, dict(self.EMPTY, added=1, skipped=3, duplicates=1, failed=1))
+        self.assertEqual(len(image_db.list_images()), 4)
+
+    def test_refresh_only_changed_files(self):
+        ingest.ingest_directory(self.root, workers=0)
+        path = os.path.join(self.root, "img1.png")
+        Image.new("RGB", (64, 64), (1, 2, 3)).save(path)
+        os.utime(path, (1, 1))
+        os.remove(os.path.join(self.root, "img0.png"))
+        with mock.patch("image_utils.compute_image_metadata", wraps=image_utils.compute_image_metadata) as compute:
+            stats = ingest.refresh_library(workers=0)
+        self.assertEqual(compute.call_count, 1)
+        self.assertEqual(stats, dict(self.EMPTY, refreshed=1, skipped=1, missing=1))
+        img = [i for i in image_db.list_images() if i["title"] == "img1"][0]
+        self.assertEqual(img["metadata"]["width"], 64)
+        self.assertEqual(ingest.refresh_library(workers=0), dict(self.EMPTY, skipped=2, missing=1))
+
+    def test_spawn_worker_imports_app_without_tk(self):
+        # spawn workers started from the GUI re-import app.py as __mp_main__
+        repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = {k: v for k, v in os.environ.items() if k != "DISPLAY"}
+        code = (
+            "import runpy, tkinter, ingest\n"
+            "runpy.run_path('app.py', run_name='__mp_main__')\n"
+            "assert tkinter._default_root is None\n"
+            f"assert ingest._analyse(({os.path.join(self.root, 'img0.png')!r}, False))[2]['width'] == 40\n"
+        )
+        subprocess.run([sys.executable, "-c", code], cwd=repo_root, env=env, check=True, capture_output=True)
+
+    def test_add_image_dedup(self):
+        image_db.init_db()
+        path = os.path.join(self.root, "img0.png")
+        first = image_db.add_image(path, title="first")
+        copy = os.path.join(self.tmpdir, "copy.png")
+        shutil.copy(path, copy)
+        with mock.patch("image_utils.compute_image_metadata") as compute:
+            self.assertEqual(image_db.add_image(path), first)
+            self.assertEqual(image_db.add_image(copy), first)
+        compute.assert_not_called()
+        self.assertEqual(len(image_db.list_images()), 1)
+
+    def test_not_recursive(self):
+        files = list(ingest.iter_image_files(self.root, recursive=False))
+        self.assertEqual([os.path.basename(p) for p in files], ["broken.jpg", "img0.png", "img1.png"])
+
+
+if __name__ == "__main__":
+    unittest.main()
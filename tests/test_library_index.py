@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import db
+import image_db
+import library_index
+from library_index import LibraryIndex
+
+
+class _WidthIndex(LibraryIndex):
+    on_load = None
+
+    def __init__(self, path=None):
+        super().__init__(path)
+        self.widths = {}
+
+    def _load(self, conn):
+        rows = conn.execute("SELECT id, width FROM images").fetchall()
+        # a write landing while build() is reading the database
+        if self.on_load:
+            self.on_load()
+        return rows
+
+    def _value(self, metadata):
+        return (metadata or {}).get("width")
+
+    def _reset(self, n):
+        self.widths = {}
+
+    def _put(self, image_id, value):
+        self.widths[image_id] = value
+
+
+class TestLibraryIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self._orig_path = image_db.DB_PATH
+        image_db.DB_PATH = os.path.join(self.tmpdir, "images.sqlite3")
+        image_db.init_db()
+
+    def tearDown(self):
+        library_index.reset()
+        db.close()
+        image_db.DB_PATH = self._orig_path
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_changes_during_build_are_replayed(self):
+        a = image_db.add_image("a.jpg", metadata={"width": 10})
+        index = library_index.shared(_WidthIndex)
+        self.assertIs(library_index.shared(_WidthIndex), index)
+        index.on_load = lambda: image_db.update_image(a, metadata={"width": 20})
+        index.build()
+        self.assertEqual(index.widths, {a: 20})
+        index.on_load = None
+        b = image_db.add_image("b.jpg", metadata={"width": 30})
+        self.assertEqual(index.widths, {a: 20, b: 30})
+
+    def test_shared_per_database(self):
+        index = library_index.shared(_WidthIndex)
+        index.build()
+        image_db.DB_PATH = os.path.join(self.tmpdir, "other.sqlite3")
+        image_db.init_db()
+        other = library_index.shared(_WidthIndex)
+        self.assertIsNot(other, index)
+        image_db.add_image("c.jpg", metadata={"width": 5})
+        # the first index belongs to another file and ignores the write
+        self.assertEqual(index.widths, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
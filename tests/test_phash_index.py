@@ -0,0 +1,76 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import db
+import image_db
+import library_index
+import phash_index
+from image_utils import hamming_distance, phash_to_int
+
+
+class TestBKTree(unittest.TestCase):
+    def test_within_matches_scan(self):
+        rng = random.Random(3)
+        hashes = [phash_to_int(rng.getrandbits(64)) for _ in range(2000)]
+        # a few clusters of near-duplicates
+        for base in hashes[:20]:
+            for _ in range(5):
+                hashes.append(phash_to_int(base ^ (1 << rng.randrange(64)) ^ (1 << rng.randrange(64))))
+        tree = phash_index.BKTree()
+        for i, h in enumerate(hashes):
+            tree.add(h, i)
+        for q in hashes[:50]:
+            for d in (0, 4, 10):
+                expected = sorted(((i, hamming_distance(q, h)) for i, h in enumerate(hashes) if hamming_distance(q, h) <= d), key=lambda x: (x[1], x[0]))
+                self.assertEqual(tree.within(q, d), expected)
+
+    def test_phash_to_int(self):
+        self.assertEqual(phash_to_int("ffffffffffffffff"), -1)
+        self.assertEqual(phash_to_int("0000000000000001"), 1)
+        self.assertIsNone(phash_to_int(None))
+        self.assertIsNone(phash_to_int("zz"))
+        self.assertEqual(hamming_distance(phash_to_int("ffffffffffffffff"), 0), 64)
+
+
+class TestPhashIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self._orig_path = image_db.DB_PATH
+        image_db.DB_PATH = os.path.join(self.tmpdir, "images.sqlite3")
+        image_db.init_db()
+
+    def tearDown(self):
+        db.close()
+        library_index.reset()
+        image_db.DB_PATH = self._orig_path
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_duplicates_follow_library(self):
+        a = image_db.add_image("a.jpg", metadata={"phash": "f0f0f0f0f0f0f0f0"})
+        image_db.add_image("b.jpg", metadata={"phash": "0f0f0f0f0f0f0f0f"})
+        self.assertEqual(phash_index.find_near_duplicates("f0f0f0f0f0f0f0f1"), [(a, 1)])
+        # added after the index was loaded
+        c = image_db.add_image("c.jpg", metadata={"phash": "f0f0f0f0f0f0f0f3"})
+        self.assertEqual(phash_index.find_near_duplicates("f0f0f0f0f0f0f0f0", exclude=a), [(c, 2)])
+        image_db.update_image(c, metadata={"phash": None})
+        self.assertEqual(phash_index.find_near_duplicates("f0f0f0f0f0f0f0f0"), [(a, 0)])
+        self.assertEqual(phash_index.find_near_duplicates(None), [])
+
+    def test_phash_column_migration(self):
+        # a library created before the phash column existed
+        db.close()
+        os.remove(image_db.DB_PATH)
+        with db.write(image_db.DB_PATH) as conn:
+            conn.execute("CREATE TABLE images (id INTEGER PRIMARY KEY AUTOINCREMENT, path TEXT NOT NULL, title TEXT, description TEXT, tags TEXT, metadata TEXT)")
+            conn.execute("""INSERT INTO images (path, tags, metadata) VALUES ('old.jpg', '', '{"phash": "8000000000000000"}')""")
+        image_db.init_db()
+        with db.read(image_db.DB_PATH) as conn:
+            self.assertEqual(conn.execute("SELECT phash FROM images").fetchone()[0], -(1 << 63))
+        self.assertEqual(len(phash_index.find_near_duplicates("8000000000000000", max_distance=0)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import db
+import storage
+from publisher import PublishPool
+
+
+class SlowConnector:
+    def __init__(self, delay=0.02, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def post(self, content, **kwargs):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            if self.fail:
+                raise RuntimeError("boom")
+            return {"status": "ok", "content": content}
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+class TestPublishPool(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self._orig_path = storage.DB_PATH
+        storage.DB_PATH = os.path.join(self.tmpdir, "bot.db")
+        storage.init_db()
+
+    def tearDown(self):
+        db.close()
+        storage.DB_PATH = self._orig_path
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _claim(self, n):
+        for i in range(n):
+            storage.add_scheduled_post(f"post {i}", 0)
+        return storage.claim_due_posts(now=1, limit=n)
+
+    def test_parallel_with_concurrency_cap(self):
+        conn = SlowConnector()
+        pool = PublishPool({"Stub": lambda: conn}, max_workers=16, limits={"Stub": {"concurrency": 5}})
+        rows = self._claim(100)
+        start = time.monotonic()
+        for r in rows:
+            pool.submit(r)
+        pool.shutdown()
+        elapsed = time.monotonic() - start
+        self.assertEqual(conn.max_active, 5)
+        # 100 posts at 20ms each take 2s serially; five at a time about 0.4s
+        self.assertLess(elapsed, 1.0)
+        self.assertTrue(all(r["status"] == "sent" for r in storage.list_scheduled()))
+
+    def test_rate_limit(self):
+        conn = SlowConnector(delay=0)
+        pool = PublishPool({"Stub": lambda: conn}, limits={"Stub": {"rate": 50.0, "burst": 1}})
+        start = time.monotonic()
+        for r in self._claim(20):
+            pool.submit(r)
+        pool.shutdown()
+        self.assertGreaterEqual(time.monotonic() - start, 19 / 50.0 * 0.9)
+
+    def test_failures_are_requeued(self):
+        pool = PublishPool({"Stub": lambda: SlowConnector(delay=0, fail=True)}, retry_delay=60)
+        for r in self._claim(3):
+            pool.submit(r)
+        pool.shutdown()
+        rows = storage.list_scheduled()
+        self.assertTrue(all(r["status"] == "pending" and r["run_at"] > time.time() for r in rows))
+
+
+if __name__ == "__main__":
+    unittest.main()
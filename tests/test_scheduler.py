@@ -1,6 +1,13 @@
+import os
+import shutil
+import tempfile
+import threading
 import unittest
 import time
-from scheduler import Scheduler
+
+import db
+import storage
+from scheduler import Scheduler, ScheduledPostDispatcher
 
 
 class TestScheduler(unittest.TestCase):
@@ -16,6 +23,98 @@ class TestScheduler(unittest.TestCase):
         time.sleep(0.1)
         self.assertEqual(results, ["hello"])
 
+    def test_runs_in_due_order_and_cancels(self):
+        s = Scheduler(max_workers=1)
+        results = []
+        s.schedule_post("second", delay_seconds=0.2, on_post=results.append)
+        s.schedule_post("first", delay_seconds=0.1, on_post=results.append)
+        job = s.schedule_post("cancelled", delay_seconds=0.15, on_post=results.append)
+        self.assertEqual(s.pending(), 3)
+        self.assertTrue(job.cancel())
+        self.assertFalse(job.cancel())
+        self.assertEqual(s.pending(), 2)
+        time.sleep(0.4)
+        self.assertEqual(results, ["first", "second"])
+        self.assertEqual(s.pending(), 0)
+        s.shutdown()
+
+    def test_slow_job_does_not_block_others(self):
+        s = Scheduler(max_workers=4)
+        start = time.monotonic()
+        finished = {}
+
+        def job(i):
+            if i == 0:
+                time.sleep(1.0)
+            finished[i] = time.monotonic() - start
+
+        for i in range(8):
+            s.schedule(0, job, i)
+        time.sleep(0.5)
+        # every job but the slow one is done while it is still sleeping
+        self.assertEqual(sorted(finished), list(range(1, 8)))
+        s.shutdown()
+
+    def test_cancelled_jobs_are_compacted(self):
+        s = Scheduler()
+        jobs = [s.schedule_post(str(i), delay_seconds=60) for i in range(1000)]
+        for job in jobs[:900]:
+            job.cancel()
+        self.assertEqual(s.pending(), 100)
+        # the heap does not keep holding every cancelled job
+        self.assertLessEqual(len(s._heap), 200)
+        s.shutdown()
+
+
+class TestScheduledPostDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self._orig_path = storage.DB_PATH
+        storage.DB_PATH = os.path.join(self.tmpdir, "bot.db")
+        storage.init_db()
+        self.published = []
+        self.done = threading.Event()
+        self.expected = 0
+
+    def tearDown(self):
+        self.dispatcher.stop(timeout=5)
+        db.close()
+        storage.DB_PATH = self._orig_path
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _publish(self, row):
+        self.published.append((row["id"], time.time() - row["run_at"]))
+        if len(self.published) >= self.expected:
+            self.done.set()
+
+    def test_wakes_early_and_never_scans_idle(self):
+        self.dispatcher = ScheduledPostDispatcher(self._publish)
+        self.dispatcher.start()
+        time.sleep(0.3)
+        # nothing queued: a single look at the queue, then sleep without polling
+        self.assertEqual(self.dispatcher.wakeups, 1)
+        self.expected = 1
+        start = time.time()
+        storage.add_scheduled_post("now", int(time.time()))
+        self.assertTrue(self.done.wait(2))
+        self.assertLess(time.time() - start, 0.5)
+        self.dispatcher.stop(timeout=5)
+        self.assertEqual(storage.list_scheduled()[0]["status"], "sent")
+
+    def test_dispatch_lateness_many_jobs(self):
+        self.dispatcher = ScheduledPostDispatcher(self._publish)
+        self.dispatcher.start()
+        base = int(time.time()) + 2
+        self.expected = 3000
+        for i in range(self.expected):
+            storage.add_scheduled_post(f"post {i}", base + i % 2)
+        self.assertTrue(self.done.wait(10))
+        lateness = [late for _, late in self.published]
+        self.assertEqual(len({pid for pid, _ in self.published}), self.expected)
+        # nothing goes out early, and nothing is more than a fraction of a second late
+        self.assertGreaterEqual(min(lateness), 0)
+        self.assertLess(max(lateness), 1.0)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import db
+import search_cache
+
+
+class TestSearchCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self._orig = (search_cache.DB_PATH, search_cache.MAX_ENTRIES, dict(search_cache._stats))
+        search_cache.DB_PATH = os.path.join(self.tmpdir, "cache.sqlite3")
+        for k in search_cache._stats:
+            search_cache._stats[k] = 0
+        self.calls = []
+
+    def tearDown(self):
+        db.close()
+        search_cache.DB_PATH, search_cache.MAX_ENTRIES, stats = self._orig
+        search_cache._stats.update(stats)
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def fetch(self, query, max_results):
+        self.calls.append(query)
+        return [{"url": f"https://example.com/{query}/{len(self.calls)}"}]
+
+    def test_normalized_hits_and_misses(self):
+        first = search_cache.get_or_fetch("Coffee  Mug", 6, self.fetch)
+        self.assertEqual(search_cache.get_or_fetch("  coffee mug ", 6, self.fetch), first)
+        search_cache.get_or_fetch("coffee mug", 3, self.fetch)
+        self.assertEqual(self.calls, ["Coffee  Mug", "coffee mug"])
+        self.assertEqual(search_cache.stats()["hits"], 1)
+        self.assertEqual(search_cache.stats()["misses"], 2)
+        # empty results are not cached
+        search_cache.get_or_fetch("nothing", 6, lambda q, n: [])
+        self.assertEqual(search_cache.get("nothing|6"), (None, False))
+
+    def test_stale_while_revalidate(self):
+        key = search_cache.cache_key("tea", 6)
+        search_cache.put(key, ["old"], now=time.time() - search_cache.TTL - 1)
+        refreshed = threading.Event()
+
+        def fetch(query, max_results):
+            refreshed.set()
+            return ["new"]
+
+        # served stale at once, refreshed in the background
+        self.assertEqual(search_cache.get_or_fetch("tea", 6, fetch), ["old"])
+        self.assertTrue(refreshed.wait(5))
+        deadline = time.time() + 5
+        while search_cache.stats()["refreshes"] == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(search_cache.get(key), (["new"], True))
+        self.assertEqual(search_cache.stats()["stale_hits"], 1)
+
+    def test_lru_eviction(self):
+        search_cache.MAX_ENTRIES = 3
+        now = time.time()
+        for i, q in enumerate("abc"):
+            search_cache.put(q, [q], now=now + i)
+        search_cache.get("a", now=now + 10)  # a is now the most recently used
+        search_cache.put("d", ["d"], now=now + 11)
+        self.assertEqual(search_cache.get("b"), (None, False))
+        self.assertEqual(search_cache.get("a")[0], ["a"])
+        self.assertEqual(search_cache.stats()["evictions"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import db
+import image_db
+import library_index
+import similarity_index
+
+
+class TestSimilarityIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self._orig_path = image_db.DB_PATH
+        image_db.DB_PATH = os.path.join(self.tmpdir, "images.sqlite3")
+        image_db.init_db()
+
+    def tearDown(self):
+        db.close()
+        library_index.reset()
+        image_db.DB_PATH = self._orig_path
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _add(self, color, w=100, h=100):
+        return image_db.add_image("x.jpg", metadata={"avg_color": color, "width": w, "height": h})
+
+    def _check_ranking(self):
+        red = self._add([250, 0, 0])
+        dark_red = self._add([200, 10, 10])
+        blue = self._add([0, 0, 250])
+        no_color = self._add(None)
+        big_red = self._add([250, 0, 0], w=1100, h=100)
+        self.assertEqual([i for i, _ in similarity_index.find_similar(red, k=2)], [big_red, dark_red])
+        self.assertAlmostEqual(similarity_index.find_similar(red, k=1)[0][1], 10.0)
+        # built lazily above; later writes reach it through image_db.subscribe()
+        orange = self._add([250, 5, 0])
+        self.assertEqual(similarity_index.find_similar(red, k=1)[0][0], orange)
+        image_db.update_image(blue, metadata={"avg_color": [251, 0, 0], "width": 100, "height": 100})
+        self.assertEqual(similarity_index.find_similar(red, k=1)[0][0], blue)
+        ranked = similarity_index.find_similar(red, k=10)
+        self.assertEqual(len(ranked), 5)
+        self.assertEqual(ranked[-1], (no_color, float("inf")))
+        self.assertEqual(similarity_index.find_similar(9999), [])
+
+    def test_ranking(self):
+        self._check_ranking()
+
+    def test_ranking_without_numpy(self):
+        with mock.patch.object(similarity_index, "np", None):
+            self._check_ranking()
+
+    def test_matches_scan(self):
+        # same order as scoring every image one by one
+        import random
+
+        rng = random.Random(7)
+        ids = [self._add([rng.randrange(256) for _ in range(3)], rng.randrange(50, 500), rng.randrange(50, 500)) for _ in range(300)]
+        index = similarity_index.SimilarityIndex()
+        index.build()
+        src = image_db.get_image(ids[0])["metadata"]
+        expected = []
+        for img in image_db.list_images():
+            if img["id"] == ids[0]:
+                continue
+            m = img["metadata"]
+            d = sum((src["avg_color"][i] - m["avg_color"][i]) ** 2 for i in range(3)) ** 0.5
+            expected.append((d + (abs(src["width"] - m["width"]) + abs(src["height"] - m["height"])) / 100.0, img["id"]))
+        expected.sort()
+        self.assertEqual([i for i, _ in index.similar(ids[0], k=10)], [i for _, i in expected[:10]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,191 @@
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import db
+import storage
+
+
+def _drain_queue(db_path, owner, results):
+    """Worker process for the multi-process test: claim and publish until the queue is empty."""
+    storage.DB_PATH = db_path
+    published = []
+    while True:
+        rows = storage.claim_due_posts(limit=7, owner=owner)
+        if not rows:
+            break
+        published.extend(r["id"] for r in rows)
+        storage.record_publish_results([r["id"] for r in rows], owner=owner)
+    results.put(published)
+
+
+class TestStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self._orig_path = storage.DB_PATH
+        storage.DB_PATH = os.path.join(self.tmpdir, "bot.db")
+        storage.init_db()
+
+    def tearDown(self):
+        db.close()
+        storage.DB_PATH = self._orig_path
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_wal_mode(self):
+        with db.read(storage.DB_PATH) as conn:
+            mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode.lower(), "wal")
+
+    def test_concurrent_reads_and_writes(self):
+        errors = []
+
+        def worker(n):
+            try:
+                for i in range(50):
+                    storage.set_setting(f"k{n}", str(i))
+                    self.assertEqual(storage.get_setting(f"k{n}"), str(i))
+                    storage.add_scheduled_post(f"post {n}-{i}", i)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                db.close()
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(storage.list_scheduled()), 8 * 50)
+
+    def test_settings_cache_write_through(self):
+        storage.set_setting("ENABLE_AI", "1")
+        self.assertEqual(storage.get_setting("ENABLE_AI"), "1")
+        with mock.patch.object(storage, "_select_settings", wraps=storage._select_settings) as select:
+            storage.set_setting("ENABLE_AI", "2")
+            self.assertEqual(storage.get_setting("ENABLE_AI"), "2")
+        # own writes keep the copy current: nothing is reloaded
+        select.assert_not_called()
+
+    def test_settings_changed_by_another_process(self):
+        seen = []
+        cb = storage.subscribe_setting(lambda k, v: seen.append((k, v)), "FB_PAGE_ID")
+        try:
+            storage.set_setting("FB_PAGE_ID", "old")
+            self.assertEqual(storage.get_setting("FB_PAGE_ID"), "old")
+            # a separate connection stands in for another process sharing the file
+            other = sqlite3.connect(storage.DB_PATH)
+            with other:
+                other.execute("REPLACE INTO settings (key, value) VALUES ('FB_PAGE_ID', 'new')")
+            other.close()
+            self.assertEqual(storage.get_setting("FB_PAGE_ID"), "new")
+        finally:
+            storage.unsubscribe_setting(cb, "FB_PAGE_ID")
+        self.assertEqual(seen, [("FB_PAGE_ID", "old"), ("FB_PAGE_ID", "new")])
+
+    def test_setting_subscribers(self):
+        seen = []
+        cb = storage.subscribe_setting(lambda k, v: seen.append((k, v)), "BRAND_PROFILE")
+        try:
+            storage.get_setting("BRAND_PROFILE")
+            storage.set_setting("BRAND_PROFILE", "{}")
+            storage.set_setting("BRAND_PROFILE", "{}")  # unchanged: no notification
+            storage.set_setting("OTHER", "x")
+        finally:
+            storage.unsubscribe_setting(cb, "BRAND_PROFILE")
+        self.assertEqual(seen, [("BRAND_PROFILE", "{}")])
+
+    def test_mark_sent(self):
+        pid = storage.add_scheduled_post("hello", 10)
+        storage.mark_scheduled_sent(pid)
+        rows = storage.list_scheduled()
+        self.assertEqual(rows[0]["status"], "sent")
+
+    def test_claim_due_posts(self):
+        due = storage.add_scheduled_post("due", 100)
+        storage.add_scheduled_post("later", 500)
+        self.assertEqual(storage.next_due_time(), 100)
+        claimed = storage.claim_due_posts(now=200, lease_seconds=60)
+        self.assertEqual([r["id"] for r in claimed], [due])
+        # claimed rows are leased: a second poller gets nothing until the lease expires
+        self.assertEqual(storage.claim_due_posts(now=200), [])
+        self.assertEqual(storage.next_due_time(), 260)
+        self.assertEqual([r["id"] for r in storage.claim_due_posts(now=260)], [due])
+        storage.mark_scheduled_sent(due)
+        self.assertEqual(storage.next_due_time(), 500)
+
+    def test_release_returns_post_to_queue(self):
+        pid = storage.add_scheduled_post("retry me", 100)
+        storage.claim_due_posts(now=100)
+        storage.release_scheduled_post(pid)
+        self.assertEqual([r["id"] for r in storage.claim_due_posts(now=100)], [pid])
+
+    def test_batched_writes(self):
+        ids = storage.add_scheduled_posts([("a", 30), ("b", 10), ("c", 20)])
+        rows = {r["id"]: r for r in storage.list_scheduled()}
+        self.assertEqual([rows[i]["content"] for i in ids], ["a", "b", "c"])
+        self.assertEqual(storage.mark_scheduled_sent_many(ids[:2]), 2)
+        self.assertEqual(storage.set_scheduled_status(ids, "pending", from_status="sent"), 2)
+        self.assertEqual({r["status"] for r in storage.list_scheduled()}, {"pending"})
+        with self.assertRaises(ValueError):
+            storage.set_scheduled_status(ids, "archived")
+
+    def test_archive_and_compact(self):
+        old, recent, pending = storage.add_scheduled_posts([("old", 0), ("recent", 0), ("pending", 0)])
+        storage.mark_scheduled_sent_many([old, recent])
+        with db.write(storage.DB_PATH) as conn:
+            conn.execute("UPDATE scheduled SET sent_at = 1000 WHERE id = ?", (old,))
+        now = 1000 + 10 * 86400
+        self.assertEqual(storage.archive_sent_posts(older_than_days=5, now=now), 1)
+        self.assertEqual(sorted(r["id"] for r in storage.list_scheduled()), [recent, pending])
+        with db.read(storage.DB_PATH) as conn:
+            archived = conn.execute("SELECT id, content FROM scheduled_archive").fetchall()
+            auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        self.assertEqual(archived, [(old, "old")])
+        self.assertEqual(auto_vacuum, 2)
+        storage.compact_db()
+        with db.read(storage.DB_PATH) as conn:
+            self.assertEqual(conn.execute("PRAGMA freelist_count").fetchone()[0], 0)
+
+    def test_leases_are_owned(self):
+        pid = storage.add_scheduled_post("leased", 100)
+        storage.claim_due_posts(now=100, lease_seconds=60, owner="a")
+        # heartbeats only extend your own lease
+        self.assertEqual(storage.renew_leases([pid], "b", 60, now=150), 0)
+        self.assertEqual(storage.renew_leases([pid], "a", 60, now=150), 1)
+        self.assertEqual(storage.claim_due_posts(now=200, owner="b"), [])
+        # the lease expires without a heartbeat and "b" reclaims it; "a" can no longer settle it
+        self.assertEqual([r["id"] for r in storage.claim_due_posts(now=210, owner="b")], [pid])
+        storage.record_publish_results([pid], owner="a")
+        self.assertEqual(storage.list_scheduled()[0]["status"], "in_flight")
+        storage.record_publish_results([pid], owner="b")
+        self.assertEqual(storage.list_scheduled()[0]["status"], "sent")
+
+    def test_multi_process_no_duplicates(self):
+        ids = storage.add_scheduled_posts([(f"post {i}", 0) for i in range(400)])
+        ctx = multiprocessing.get_context("spawn")
+        results = ctx.Queue()
+        procs = [ctx.Process(target=_drain_queue, args=(storage.DB_PATH, f"worker-{n}", results)) for n in range(4)]
+        for p in procs:
+            p.start()
+        published = [pid for _ in procs for pid in results.get(timeout=60)]
+        for p in procs:
+            p.join(timeout=60)
+        self.assertEqual(sorted(published), ids)
+        self.assertEqual({r["status"] for r in storage.list_scheduled()}, {"sent"})
+
+    def test_claim_uses_index(self):
+        with db.read(storage.DB_PATH) as conn:
+            plan = conn.execute(
+                "EXPLAIN QUERY PLAN SELECT id FROM scheduled WHERE status = 'pending' AND run_at <= 1 ORDER BY run_at"
+            ).fetchall()
+        self.assertIn("idx_scheduled_status_run_at", " ".join(str(r) for r in plan))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from PIL import Image
+
+import disk_lru
+import http_client
+import thumb_cache
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.hits[self.path] = self.server.hits.get(self.path, 0) + 1
+        buf = io.BytesIO()
+        Image.new("RGB", (1600, 1200), (10, 200, 10)).save(buf, "JPEG", quality=90)
+        body = buf.getvalue()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class TestThumbCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self._orig = (thumb_cache.CACHE_DIR, thumb_cache.MAX_BYTES)
+        thumb_cache.CACHE_DIR = os.path.join(self.tmpdir, "cache")
+
+    def tearDown(self):
+        thumb_cache.CACHE_DIR, thumb_cache.MAX_BYTES = self._orig
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _image(self, name, color, size=(1600, 1200)):
+        path = os.path.join(self.tmpdir, name)
+        Image.new("RGB", size, color).save(path, quality=90)
+        return path
+
+    def test_cached_by_content_and_size(self):
+        path = self._image("a.jpg", (200, 10, 10))
+        thumb = thumb_cache.load_thumbnail(path, (560, 360))
+        self.assertEqual(thumb.size, (480, 360))
+        copy = os.path.join(self.tmpdir, "copy.jpg")
+        shutil.copy(path, copy)
+        with mock.patch.object(thumb_cache.Image, "open", wraps=Image.open) as opened:
+            # the copy has the same bytes: served from the cache, original never decoded
+            out = thumb_cache.thumbnail_path(copy, (560, 360))
+            self.assertEqual(opened.call_count, 0)
+        self.assertEqual(out, thumb_cache.thumbnail_path(path, (560, 360)))
+        self.assertNotEqual(out, thumb_cache.thumbnail_path(path, (220, 140)))
+        # edited file: new bytes, new thumbnail
+        Image.new("RGB", (100, 50), (0, 0, 255)).save(path)
+        self.assertEqual(thumb_cache.load_thumbnail(path, (560, 360)).size, (100, 50))
+
+    def test_hash_memo_bounded(self):
+        thumb_cache._hashes.clear()
+        orig_items = thumb_cache.HASH_ITEMS
+        thumb_cache.HASH_ITEMS = 2
+        try:
+            paths = [self._image(f"h{i}.png", (i, 0, 0), size=(8, 8)) for i in range(3)]
+            for p in paths:
+                thumb_cache.thumbnail_path(p, (8, 8))
+            self.assertEqual([k[0] for k in thumb_cache._hashes], [os.path.abspath(p) for p in paths[1:]])
+        finally:
+            thumb_cache.HASH_ITEMS = orig_items
+
+    def test_lru_eviction(self):
+        paths = [self._image(f"{i}.png", (i * 40, 0, 0), size=(300, 300)) for i in range(4)]
+        thumbs = [thumb_cache.thumbnail_path(p, (300, 300)) for p in paths[:3]]
+        old = time.time() - 100
+        for i, t in enumerate(thumbs):
+            os.utime(t, (old + i, old + i))
+        thumb_cache.MAX_BYTES = sum(os.path.getsize(t) for t in thumbs) + 10
+        thumb_cache.thumbnail_path(paths[0], (300, 300))  # hit: now the most recent
+        thumb_cache.thumbnail_path(paths[3], (300, 300))  # over the limit: evicts the oldest
+        self.assertEqual([os.path.exists(t) for t in thumbs], [True, False, False])
+        total = sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(thumb_cache.CACHE_DIR) for f in fs)
+        self.assertLessEqual(total, thumb_cache.MAX_BYTES * disk_lru.LOW_WATER)
+
+
+class TestUrlThumbnails(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        cls.server.lock = threading.Lock()
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        http_client.close_all()
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self._orig = (thumb_cache.CACHE_DIR, thumb_cache.MEMORY_ITEMS)
+        thumb_cache.CACHE_DIR = os.path.join(self.tmpdir, "cache")
+        thumb_cache._memory.clear()
+        self.server.hits = {}
+
+    def tearDown(self):
+        thumb_cache.CACHE_DIR, thumb_cache.MEMORY_ITEMS = self._orig
+        thumb_cache._memory.clear()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_decoded_in_memory_and_reused(self):
+        futures = [thumb_cache.url_thumbnail(self.base + "/a.jpg", (220, 140)) for _ in range(3)]
+        ims = [f.result(5) for f in futures]
+        self.assertEqual(ims[0].size, (187, 140))
+        self.assertEqual(self.server.hits["/a.jpg"], 1)
+        again = thumb_cache.url_thumbnail(self.base + "/a.jpg", (220, 140))
+        self.assertTrue(again.done())
+        self.assertIs(again.result(), ims[0])
+        self.assertEqual(self.server.hits["/a.jpg"], 1)
+        self.assertFalse(os.path.exists(thumb_cache.CACHE_DIR))
+
+    def test_memory_lru(self):
+        thumb_cache.MEMORY_ITEMS = 2
+        for name in ("a", "b", "a", "c"):
+            thumb_cache.url_thumbnail(f"{self.base}/{name}", (100, 100)).result(5)
+        # "b" was least recently used when "c" arrived
+        self.assertEqual([k[0].rsplit("/", 1)[1] for k in thumb_cache._memory], ["a", "c"])
+
+
+if __name__ == "__main__":
+    unittest.main()
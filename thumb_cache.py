@@ -0,0 +1,163 @@
+"""On-disk thumbnail cache shared by the library, preview and confirmation windows.
+
+Thumbnails are WebP files (PNG where Pillow lacks WebP) named after the
+sha256 of the original's bytes and the requested box, so a renamed or copied
+file reuses the same thumbnail and an edited one gets a new one. They are
+generated lazily on first use from a reduced-resolution decode. The directory
+is bounded by size: each hit refreshes a file's mtime, and the least recently
+used files are deleted once the total exceeds ``MAX_BYTES``.
+
+Remote thumbnails (the search suggestion grid) never touch the disk: they are
+decoded straight from the response bytes on a small shared pool and kept in
+an in-memory LRU keyed by URL and box, so re-rendering a grid is free.
+
+Usage:
+    im = thumb_cache.load_thumbnail(path, (560, 360))
+    future = thumb_cache.url_thumbnail(url, (220, 140))
+"""
+import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from PIL import Image, features
+
+import disk_lru
+import downloader
+import http_client
+from image_utils import file_sha256
+
+CACHE_DIR = os.path.join(os.getcwd(), ".thumb_cache")
+MAX_BYTES = 200 * 1024 * 1024
+
+_FORMAT, _EXT = ("WEBP", ".webp") if features.check("webp") else ("PNG", ".png")
+
+_lock = threading.Lock()
+HASH_ITEMS = 4096
+# (abspath, size, mtime) -> sha256, so repeat views of a file cost one stat; least recently used first
+_hashes: "OrderedDict[Tuple[str, int, float], str]" = OrderedDict()
+_lru = disk_lru.DiskLRU()
+
+MEMORY_ITEMS = 256
+URL_WORKERS = 4
+# (url, size) -> decoded thumbnail, least recently used first
+_memory: "OrderedDict[Tuple[str, Tuple[int, int]], Image.Image]" = OrderedDict()
+_pending: Dict[Tuple[str, Tuple[int, int]], Future] = {}
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _content_hash(path: str) -> str:
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime)
+    with _lock:
+        digest = _hashes.get(key)
+        if digest is not None:
+            _hashes.move_to_end(key)
+            return digest
+    digest = file_sha256(path)
+    with _lock:
+        _hashes[key] = digest
+        while len(_hashes) > HASH_ITEMS:
+            _hashes.popitem(last=False)
+    return digest
+
+
+def _reduce(im: Image.Image, size: Tuple[int, int]) -> Image.Image:
+    # JPEGs are decoded at 1/2, 1/4 or 1/8 scale
+    im.draft("RGB", size)
+    if im.mode in ("P", "1"):
+        im = im.convert("RGBA" if "transparency" in im.info else "RGB")
+    im.thumbnail(size, Image.LANCZOS, reducing_gap=2.0)
+    if im.mode not in ("RGB", "RGBA"):
+        im = im.convert("RGB")
+    return im
+
+
+def thumbnail_path(path: str, size: Tuple[int, int], content_hash: Optional[str] = None) -> str:
+    """Return the cached thumbnail file for ``path`` fitting in ``size``, creating it if needed."""
+    digest = content_hash or _content_hash(path)
+    out = os.path.join(CACHE_DIR, digest[:2], f"{digest}_{size[0]}x{size[1]}{_EXT}")
+    # hit: mark as recently used
+    if disk_lru.touch(out):
+        return out
+    with Image.open(path) as im:
+        im = _reduce(im, size)
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+        tmp = f"{out}.{os.getpid()}.{threading.get_ident()}.tmp"
+        im.save(tmp, _FORMAT, quality=85)
+    os.replace(tmp, out)
+    _lru.added(CACHE_DIR, os.path.getsize(out), MAX_BYTES)
+    return out
+
+
+def load_thumbnail(path: str, size: Tuple[int, int], content_hash: Optional[str] = None) -> Image.Image:
+    """Return the thumbnail of ``path`` as a loaded PIL image (ready for ImageTk.PhotoImage)."""
+    with Image.open(thumbnail_path(path, size, content_hash)) as im:
+        im.load()
+        return im
+
+
+def decode_thumbnail(data: bytes, size: Tuple[int, int]) -> Image.Image:
+    """Decode image bytes into a loaded thumbnail fitting in ``size``."""
+    with Image.open(io.BytesIO(data)) as im:
+        im = _reduce(im, size)
+        im.load()
+        return im
+
+
+def _fetch_url_thumbnail(url: str, size: Tuple[int, int]) -> Image.Image:
+    with http_client.get(url, stream=True, timeout=10) as resp:
+        resp.raise_for_status()
+        buf = bytearray()
+        for chunk in resp.iter_content(downloader.CHUNK_SIZE):
+            buf += chunk
+            if len(buf) > downloader.MAX_DOWNLOAD_BYTES:
+                raise downloader.DownloadTooLarge(f"{url} exceeds {downloader.MAX_DOWNLOAD_BYTES} bytes")
+    http_client.record_bytes(url, len(buf))
+    im = decode_thumbnail(bytes(buf), size)
+    with _lock:
+        _memory[(url, size)] = im
+        _memory.move_to_end((url, size))
+        while len(_memory) > MEMORY_ITEMS:
+            _memory.popitem(last=False)
+    return im
+
+
+def _url_done(key: Tuple[str, Tuple[int, int]], fut: Future):
+    with _lock:
+        if _pending.get(key) is fut:
+            del _pending[key]
+
+
+def url_thumbnail(url: str, size: Tuple[int, int]) -> Future:
+    """Return a future of the thumbnail of the image at ``url``, fitting in ``size``.
+
+    Memory hits come back as an already completed future; concurrent requests
+    for the same thumbnail share one download.
+    """
+    global _executor
+    key = (url, tuple(size))
+    with _lock:
+        im = _memory.get(key)
+        if im is not None:
+            _memory.move_to_end(key)
+            fut = Future()
+            fut.set_result(im)
+            return fut
+        fut = _pending.get(key)
+        if fut is None:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=URL_WORKERS, thread_name_prefix="thumb")
+            fut = _pending[key] = _executor.submit(_fetch_url_thumbnail, url, key[1])
+            fut.add_done_callback(lambda f, key=key: _url_done(key, f))
+        return fut
+
+
+def clear():
+    """Delete every cached thumbnail."""
+    _lru.clear(CACHE_DIR)
+    with _lock:
+        _hashes.clear()
+        _memory.clear()